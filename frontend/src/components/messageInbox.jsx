@@ -12,20 +12,22 @@ function MessageInbox({ onSelectConversation, userId }) {
     const { chatID } = useParams(); // Get chatID from the URL
     const [loading, setLoading] = useState(false);
     const [chats, setChats] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [inboxSearch, setInboxSearch] = useState("");
     const [isDialogOpen, setIsDialogOpen] = useState(false);
     const [users, setUsers] = useState([]);
     const [userSearch, setUserSearch] = useState("");
     const [selectedConversation, setSelectedConversation] = useState(null);
 
-    // Fetch existing chats for the inbox
+    // Fetch the first page of existing chats for the inbox
     const fetchChats = async () => {
         setLoading(true);
         try {
             const response = await api.get("/api/chats/");
             if (response.status === 200) {
-                setChats(response.data.chats || []);;
-
+                setChats(response.data.chats || []);
+                setNextCursor(response.data.next);
             } else {
                 console.error("Failed to fetch chats.");
             }
@@ -40,6 +42,25 @@ function MessageInbox({ onSelectConversation, userId }) {
         }
     };
 
+    // Append the next page of chats, following the cursor of the last page
+    const fetchMoreChats = async () => {
+        if (!nextCursor || loadingMore) {
+            return;
+        }
+        setLoadingMore(true);
+        try {
+            const response = await api.get("/api/chats/", { params: { before: nextCursor } });
+            if (response.status === 200) {
+                setChats(prevChats => [...prevChats, ...(response.data.chats || [])]);
+                setNextCursor(response.data.next);
+            }
+        } catch (error) {
+            console.error("Error fetching more chats:", error);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     // Fetch users for the dialog
     const fetchUsers = async () => {
         setLoading(true);
@@ -210,12 +231,19 @@ function MessageInbox({ onSelectConversation, userId }) {
                                 />
                                 <div>
                                     <div className="font-semibold text-lg text-foreground">{otherUser.first_name} {otherUser.last_name}</div>
-                                    <div className="text-sm text-muted-foreground">{chat.lastMessage}</div>
+                                    <div className="text-sm text-muted-foreground">{chat.last_message?.message_text}</div>
                                 </div>
                             </li>
                         );
                     })
                 )}
+                {!loading && nextCursor && (
+                    <li className="flex justify-center p-2">
+                        <Button variant="ghost" size="sm" onClick={fetchMoreChats} disabled={loadingMore}>
+                            {loadingMore ? <Loader2 className="animate-spin" /> : "Load more"}
+                        </Button>
+                    </li>
+                )}
             </ul>
         </div>
     );
@@ -7,7 +7,7 @@ import MessageLoading from "./ui/chat/message-loading";
 import { ChatMessageList } from "./ui/chat/chat-message-list";
 import { formatTimestamp } from "@/utility/generalUtility";
 
-export default function MessagesConversation({ chatID, sender, messages: initialMessages, ws, selectedUser }) {
+export default function MessagesConversation({ chatID, sender, messages: initialMessages, ws, selectedUser, hasOlder, loadingOlder, onLoadOlder }) {
     // Constants
     const TYPING_TIMEOUT = 2000;
 
@@ -220,6 +220,18 @@ export default function MessagesConversation({ chatID, sender, messages: initial
                     <MessageLoading />
                 ) : (
                     <ChatMessageList>
+                        {hasOlder && (
+                            <div className="flex justify-center">
+                                <Button
+                                    variant="ghost"
+                                    size="sm"
+                                    onClick={onLoadOlder}
+                                    disabled={loadingOlder}
+                                >
+                                    {loadingOlder ? "Loading..." : "Load older messages"}
+                                </Button>
+                            </div>
+                        )}
                         {messages.map((msg) => {
                             const messageSender = getMessageSender(msg);
                             const isSentByCurrentUser = msg.sender_id === sender?.id;
@@ -28,6 +28,9 @@ import { chartData, chartConfig, patientDummyData, BarChartConfig, BarChartData
 import { toast } from "sonner";
 import { calculateAge, formatTimeNoSeconds } from "@/utility/generalUtility";
 
+// Matches the server's REPORT_RENDER_TIMEOUT, after which an unfinished report is marked failed
+const REPORT_POLL_TIMEOUT = 5 * 60 * 1000;
+
 function AdminHome() {
     const [stats, setStats] = useState({
         todays_appointments: 0,
@@ -123,8 +126,22 @@ function AdminHome() {
         try {
             setReportLoading(true);
     
+            // Queue the report, then poll until the server has rendered it or we give up
+            let { data: job } = await api.post('/api/admin/system-report/');
+            const deadline = Date.now() + REPORT_POLL_TIMEOUT;
+            while (job.status === 'queued' || job.status === 'rendering') {
+                if (Date.now() > deadline) {
+                    throw new Error('Report generation timed out');
+                }
+                await new Promise((resolve) => setTimeout(resolve, 1000));
+                ({ data: job } = await api.get(`/api/admin/system-report/${job.job_id}/`));
+            }
+            if (job.status !== 'completed') {
+                throw new Error(job.error || 'Report generation failed');
+            }
+
             // Use 'arraybuffer' to get the binary data
-            const response = await api.get('/api/admin/system-report/', { responseType: 'arraybuffer' });
+            const response = await api.get(job.download_url, { responseType: 'arraybuffer' });
     
             const blob = new Blob([response.data], { type: 'application/pdf' });
     
@@ -16,6 +16,9 @@ function MessagesPage() {
     const [selectedUser, setSelectedUser] = useState(null);
     const [loading, setLoading] = useState(false);
     const [messages, setMessages] = useState([]);
+    const [olderCursor, setOlderCursor] = useState(null);
+    const [hasOlder, setHasOlder] = useState(false);
+    const [loadingOlder, setLoadingOlder] = useState(false);
     const wsRef = useRef(null);
     const token = localStorage.getItem(ACCESS_TOKEN);
 
@@ -36,6 +39,41 @@ function MessagesPage() {
         fetchUserId();
     }, []);
 
+    // Marks the other participant's messages as read up to the latest one shown
+    const markRead = async (chatId, chatMessages, currentUserId) => {
+        const lastReceived = [...chatMessages].reverse().find(msg => msg.sender_id !== currentUserId);
+        if (!lastReceived || lastReceived.is_read) {
+            return;
+        }
+        try {
+            await api.post(`/api/chats/${chatId}/read/`, { message_id: lastReceived.id });
+        } catch (error) {
+            console.error("Error marking messages as read:", error);
+        }
+    };
+
+    // Loads the page of history before the oldest message shown
+    const handleLoadOlder = async () => {
+        if (!selectedConversation || !olderCursor || loadingOlder) {
+            return;
+        }
+        setLoadingOlder(true);
+        try {
+            const response = await api.get(`/api/chats/${selectedConversation}/messages/`, {
+                params: { before: olderCursor }
+            });
+            if (response.status === 200) {
+                setMessages(prevMessages => [...response.data.messages, ...prevMessages]);
+                setOlderCursor(response.data.before);
+                setHasOlder(response.data.has_more);
+            }
+        } catch (error) {
+            console.error("Error loading older messages:", error);
+        } finally {
+            setLoadingOlder(false);
+        }
+    };
+
     const handleSelectConversation = async (chatId, selectedUserId) => {
         if (!chatId || !selectedUserId) {
             return;
@@ -52,7 +90,12 @@ function MessagesPage() {
             // Fetch messages
             const messagesResponse = await api.get(`/api/chats/${chatId}/messages/`);
             if (messagesResponse.status === 200) {
-                setMessages(messagesResponse.data.messages || []);
+                const chatMessages = messagesResponse.data.messages || [];
+                setMessages(chatMessages);
+                setOlderCursor(messagesResponse.data.before);
+                setHasOlder(messagesResponse.data.has_more);
+                // Reading history does not mark it as read on the server
+                markRead(chatId, chatMessages, userId);
             }
 
             // Fetch selected user info if we have their ID
@@ -69,7 +112,19 @@ function MessagesPage() {
 
             ws.onmessage = (event) => {
                 const data = JSON.parse(event.data);
+                if (data.type === 'message_failed') {
+                    // The message was broadcast but could not be saved
+                    setMessages(prevMessages => prevMessages.filter(message => message.id !== data.id));
+                    if (data.sender_id === userId) {
+                        toast.error("Your message could not be sent");
+                    }
+                    return;
+                }
                 if (data.message_text) {
+                    if (data.sender_id !== userId && data.id) {
+                        // The message is on screen, the server applies read receipts in batches
+                        ws.send(JSON.stringify({ type: 'mark_read', message_id: data.id }));
+                    }
                     setMessages(prevMessages => [
                         ...prevMessages,
                         {
@@ -139,6 +194,9 @@ function MessagesPage() {
                         messages={messages}
                         ws={wsRef.current}
                         selectedUser={selectedUser}
+                        hasOlder={hasOlder}
+                        loadingOlder={loadingOlder}
+                        onLoadOlder={handleLoadOlder}
                     />
                 ) : (
                     <div className="flex items-center justify-center h-full">
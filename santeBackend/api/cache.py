@@ -0,0 +1,116 @@
+import threading
+import uuid
+from collections import defaultdict
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+DASHBOARD_ROLES = ('admin', 'doctor', 'patient')
+
+
+class DashboardCache:
+    """
+    Caches dashboard payloads per view, role, user, day and query string.
+
+    Entries are grouped in scopes: 'admin' for the payloads shared by all admins and
+    '<role>:<user id>' for a doctor's or patient's own dashboard. Every scope has a
+    random version in its keys; invalidating a scope replaces the version, which
+    retires all of its entries at once without having to find them.
+    """
+
+    def __init__(self, alias='dashboard', timeout=300):
+        self.alias = alias
+        self.timeout = timeout
+        self._counters = defaultdict(lambda: {'hits': 0, 'misses': 0})
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def scope_for(user):
+        return 'admin' if user.role == 'admin' else f"{user.role}:{user.id}"
+
+    def get(self, view_name, request):
+        """
+        Returns the cached (data, status) for the request, or None.
+        """
+        entry = self.cache.get(self._key(view_name, request))
+        self._count(view_name, 'hits' if entry is not None else 'misses')
+        return entry
+
+    def set(self, view_name, request, data, status):
+        self.cache.set(self._key(view_name, request), (data, status), self.timeout)
+
+    def invalidate(self, *scopes):
+        self.cache.set_many({self._version_key(scope): uuid.uuid4().hex for scope in scopes}, None)
+
+    def invalidate_on_commit(self, *scopes):
+        """
+        Invalidates the scopes now and again once the current transaction commits,
+        so a dashboard read during the transaction cannot keep the old payload.
+        """
+        self.invalidate(*scopes)
+        transaction.on_commit(lambda: self.invalidate(*scopes))
+
+    def stats(self):
+        """
+        Returns the hit and miss counts of this process, per view.
+        """
+        with self._lock:
+            return {view_name: dict(counts) for view_name, counts in self._counters.items()}
+
+    def clear(self):
+        self.cache.clear()
+        with self._lock:
+            self._counters.clear()
+
+    def _key(self, view_name, request):
+        scope = self.scope_for(request.user)
+        query = request.GET.urlencode()
+        return f"dashboard:{scope}:{self._version(scope)}:{view_name}:{timezone.now().date()}:{query}"
+
+    def _version(self, scope):
+        key = self._version_key(scope)
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, uuid.uuid4().hex, None)
+            version = self.cache.get(key)
+        return version
+
+    @staticmethod
+    def _version_key(scope):
+        return f"dashboard:version:{scope}"
+
+    def _count(self, view_name, outcome):
+        with self._lock:
+            self._counters[view_name][outcome] += 1
+
+dashboard_cache = DashboardCache(timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+
+
+def cache_dashboard(get):
+    """
+    Caches the successful responses of a dashboard view's `get` in dashboard_cache.
+    """
+    @wraps(get)
+    def wrapper(self, request, *args, **kwargs):
+        if request.user.role not in DASHBOARD_ROLES:
+            return get(self, request, *args, **kwargs)
+
+        view_name = type(self).__name__
+        entry = dashboard_cache.get(view_name, request)
+        if entry is not None:
+            data, status = entry
+            return Response(data, status=status)
+
+        response = get(self, request, *args, **kwargs)
+        if response.status_code in (200, 204):
+            dashboard_cache.set(view_name, request, response.data, response.status_code)
+        return response
+
+    return wrapper
@@ -1,10 +1,17 @@
-import datetime
+import asyncio
 import json
+from collections import Counter
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.layers import get_channel_layer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Chat, ChatMessage, Notification
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Chat, ChatMessage, Notification, NotificationCounter
 import logging
 
 # Set up logging for debugging purposes
@@ -54,25 +61,406 @@ async def send_notification(user_id, notification_data):
         }
     )
 
-class ChatConsumer(AsyncWebsocketConsumer):
+async def send_chat_message_failed(message):
     """
-    WebSocket consumer for handling real-time chat functionality.
-    Manages connections, message sending/receiving, and typing status updates.
+    Tells a chat group that a broadcast message could not be stored, so the sender
+    can offer to resend it and both participants can drop it from their view.
     """
-    
+    channel_layer = get_channel_layer()
+    await channel_layer.group_send(
+        f"chat_{message.chat_id}",
+        {
+            "type": "chat_message_failed",
+            "chat_id": str(message.chat_id),
+            "id": str(message.id),
+            "sender_id": message.sender_id,
+        }
+    )
+
+class ChatMessageWriter:
+    """
+    Write-behind persistence for chat messages, used when settings.CHAT_WRITE_BEHIND is on.
+    Consumers enqueue unsaved messages and notifications after broadcasting them and a
+    single writer task per process stores them with bulk_create, once `batch_size`
+    records are queued or `flush_interval` seconds have passed. Enqueueing waits when
+    `max_pending` records are outstanding so a slow database pushes back on senders.
+    A batch that fails is retried one message at a time, and messages that still
+    fail are reported to the chat with a chat_message_failed event.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=0.05, max_pending=1000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._queue = None
+        self._task = None
+        self._loop = None
+
+    async def enqueue(self, message, notification):
+        """
+        Queues a message and its notification for persistence.
+        """
+        self._ensure_started()
+        await self._queue.put((message, notification))
+
+    async def flush(self):
+        """
+        Waits until every queued record has been written.
+        """
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = loop.create_task(self._run(self._queue))
+
+    async def _run(self, pending):
+        while True:
+            batch = [await pending.get()]
+            deadline = self._loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(pending.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._write_or_report(batch)
+            finally:
+                for _ in batch:
+                    pending.task_done()
+
+    async def _write_or_report(self, batch):
+        """
+        Writes a batch, falling back to one transaction per message when the batch
+        fails so a single bad row does not lose the rest. Messages that still cannot
+        be stored are retracted from their chat group with a chat_message_failed event.
+        """
+        try:
+            await self._write(batch)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                failed = batch
+                logging.error(f"Error writing chat message {batch[0][0].id}: {e}")
+            else:
+                failed = []
+                logging.warning(f"Error writing {len(batch)} chat messages, saving them one by one: {e}")
+
+        if len(batch) > 1:
+            for record in batch:
+                try:
+                    await self._write([record])
+                except Exception as e:
+                    failed.append(record)
+                    logging.error(f"Error writing chat message {record[0].id}: {e}")
+
+        for message, _ in failed:
+            try:
+                await send_chat_message_failed(message)
+            except Exception as e:
+                logging.error(f"Error reporting unsaved chat message {message.id}: {e}")
+
+    @staticmethod
     @database_sync_to_async
-    def create_message_notification(self, message, recipient):
+    def _write(batch):
+        now = timezone.now()
+        unread_messages = Counter((message.chat_id, notification.recipient_id) for message, notification in batch)
+        unread_notifications = Counter(notification.recipient_id for _, notification in batch)
+        with transaction.atomic():
+            ChatMessage.objects.bulk_create([message for message, _ in batch])
+            Notification.objects.bulk_create([notification for _, notification in batch])
+            for (chat_id, recipient_id), count in unread_messages.items():
+                Chat.objects.filter(id=chat_id).update(
+                    last_updated_date=now,
+                    **chat_unread_count_update(recipient_id, count)
+                )
+            for recipient_id, count in unread_notifications.items():
+                adjust_unread_notifications(recipient_id, count)
+
+def chat_unread_count_update(user_id, delta):
+    """
+    Returns Chat.objects.update() arguments that add `delta` to `user_id`'s unread
+    message count in the updated chats, without going below zero.
+    """
+    return {
+        f'{side}_unread_count': Case(
+            When(**{f'{side}_id': user_id}, then=Greatest(F(f'{side}_unread_count') + delta, 0, output_field=PositiveIntegerField())),
+            default=F(f'{side}_unread_count')
+        )
+        for side in ('user1', 'user2')
+    }
+
+def adjust_unread_notifications(user_id, delta):
+    """
+    Adds `delta` to the user's unread notification counter, creating it if needed.
+    """
+    rows = NotificationCounter.objects.filter(user_id=user_id)
+    if rows.update(unread=Greatest(F('unread') + delta, 0, output_field=PositiveIntegerField())) or delta < 0:
+        return
+
+    try:
+        with transaction.atomic():
+            NotificationCounter.objects.create(user_id=user_id, unread=delta)
+    except IntegrityError:
+        # Another writer created the counter first
+        rows.update(unread=F('unread') + delta)
+
+chat_message_writer = ChatMessageWriter(
+    batch_size=getattr(settings, 'CHAT_WRITE_BEHIND_BATCH_SIZE', 100),
+    flush_interval=getattr(settings, 'CHAT_WRITE_BEHIND_FLUSH_INTERVAL', 0.05),
+    max_pending=getattr(settings, 'CHAT_WRITE_BEHIND_MAX_PENDING', 1000),
+)
+
+class TypingIndicator:
+    """
+    Tracks whether one user is typing in one chat and only broadcasts state changes.
+    A stop is held back for `debounce` seconds so brief pauses are not sent, and
+    typing that is not refreshed within `timeout` seconds is stopped automatically.
+    """
+
+    def __init__(self, chat_id, user_id):
+        self.chat_id = str(chat_id)
+        self.user_id = str(user_id)
+        self.debounce = getattr(settings, 'TYPING_STATUS_DEBOUNCE', 1.0)
+        self.timeout = getattr(settings, 'TYPING_STATUS_TIMEOUT', 5.0)
+        self.is_typing = False
+        self._timer = None
+
+    async def update(self, is_typing):
+        """
+        Applies a typing status update from the client.
+        """
+        if is_typing:
+            self._schedule_stop(self.timeout)
+            if not self.is_typing:
+                self.is_typing = True
+                await self._broadcast()
+        elif self.is_typing:
+            self._schedule_stop(self.debounce)
+
+    async def stop(self):
+        """
+        Immediately broadcasts that the user stopped typing, if they were typing.
+        """
+        self.cancel()
+        if self.is_typing:
+            self.is_typing = False
+            await self._broadcast()
+
+    def cancel(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _schedule_stop(self, delay):
+        self.cancel()
+        self._timer = asyncio.get_running_loop().create_task(self._stop_after(delay))
+
+    async def _stop_after(self, delay):
+        await asyncio.sleep(delay)
+        self._timer = None
+        await self.stop()
+
+    async def _broadcast(self):
+        await get_channel_layer().group_send(
+            f"chat_{self.chat_id}",
+            {
+                'type': 'typing_status',
+                'chat_id': self.chat_id,
+                'sender_id': self.user_id,
+                'is_typing': self.is_typing
+            }
+        )
+
+def mark_messages_read(chat_id, reader_id, message_ids):
+    """
+    Marks the other participant's messages in a chat as read, up to and including
+    the newest of `message_ids`, together with their notifications, and lowers the
+    reader's unread counters to match. Returns the id of that message, or None if
+    no message changed.
+    """
+    last_read = ChatMessage.objects.filter(chat_id=chat_id, id__in=message_ids).order_by(
+        '-timestamp', '-id'
+    ).values('id', 'timestamp').first()
+    if last_read is None:
+        return None
+
+    up_to = Q(timestamp__lt=last_read['timestamp']) | Q(timestamp=last_read['timestamp'], id__lte=last_read['id'])
+    with transaction.atomic():
+        updated = ChatMessage.objects.filter(up_to, chat_id=chat_id, is_read=False).exclude(
+            sender_id=reader_id
+        ).update(is_read=True)
+        if not updated:
+            return None
+
+        Chat.objects.filter(id=chat_id).update(**chat_unread_count_update(reader_id, -updated))
+        notifications = Notification.objects.filter(
+            recipient_id=reader_id,
+            chat_id=chat_id,
+            is_read=False,
+            message__in=ChatMessage.objects.filter(up_to, chat_id=chat_id)
+        ).update(is_read=True)
+        if notifications:
+            adjust_unread_notifications(reader_id, -notifications)
+    return last_read['id']
+
+async def send_read_receipt(chat_id, reader_id, message_id):
+    """
+    Tells the chat group that a user has read every message up to `message_id`.
+    """
+    await get_channel_layer().group_send(
+        f"chat_{chat_id}",
+        {
+            'type': 'read_receipt',
+            'chat_id': str(chat_id),
+            'reader_id': str(reader_id),
+            'message_id': str(message_id)
+        }
+    )
+
+class ReadReceiptBuffer:
+    """
+    Collects one user's "read up to" updates for one chat and applies them with a
+    single UPDATE and a single broadcast per `window` seconds.
+    """
+
+    def __init__(self, chat_id, user_id):
+        self.chat_id = str(chat_id)
+        self.user_id = user_id
+        self.window = getattr(settings, 'READ_RECEIPT_WINDOW', 0.5)
+        self._message_ids = set()
+        self._timer = None
+
+    def mark(self, message_id):
+        self._message_ids.add(str(message_id))
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().create_task(self._flush_after(self.window))
+
+    async def flush(self):
         """
-        Creates a new notification for a chat message.
-        Must be sync_to_async as it performs database operations.
+        Applies the pending update straight away.
         """
-        return Notification.objects.create(
-            recipient=recipient,
-            chat_id=self.chat_id,
-            message=message,
-            notification_type='NEW_MESSAGE'
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._message_ids:
+            return
+
+        message_ids, self._message_ids = self._message_ids, set()
+        if settings.CHAT_WRITE_BEHIND:
+            # The messages being read may still be waiting to be stored
+            await chat_message_writer.flush()
+        last_read = await database_sync_to_async(mark_messages_read)(self.chat_id, self.user_id, message_ids)
+        if last_read is not None:
+            await send_read_receipt(self.chat_id, self.user_id, last_read)
+
+    async def _flush_after(self, delay):
+        await asyncio.sleep(delay)
+        self._timer = None
+        await self.flush()
+
+def build_chat_message(chat, sender, recipient, message_text):
+    """
+    Builds an unsaved chat message and the recipient's notification.
+    Ids are assigned here so the message can be broadcast before it is stored.
+    """
+    message = ChatMessage(
+        chat=chat,
+        sender=sender,
+        message_text=message_text
+    )
+    notification = Notification(
+        recipient=recipient,
+        chat=chat,
+        message=message,
+        notification_type='NEW_MESSAGE'
+    )
+    return message, notification
+
+@database_sync_to_async
+def save_chat_message(chat, sender, recipient, message_text):
+    """
+    Stores a chat message, bumps the chat's last_updated_date and the recipient's
+    unread counters and creates their notification in one transaction and one
+    thread-pool hop.
+    """
+    message, notification = build_chat_message(chat, sender, recipient, message_text)
+    with transaction.atomic():
+        message.save()
+        Chat.objects.filter(id=chat.id).update(
+            last_updated_date=timezone.now(),
+            **chat_unread_count_update(recipient.id, 1)
         )
-        
+        notification.save()
+        adjust_unread_notifications(recipient.id, 1)
+    return message, notification
+
+async def post_chat_message(chat, sender, recipient, data):
+    """
+    Stores a message sent by a client, notifies the recipient and broadcasts it
+    to the chat group.
+
+    Args:
+        chat: The Chat the message belongs to
+        sender: The user sending the message
+        recipient: The other participant of the chat
+        data: The decoded client frame with 'message'
+    """
+    channel_layer = get_channel_layer()
+    chat_group_name = f"chat_{chat.id}"
+    message_text = data.get('message')
+
+    if settings.CHAT_WRITE_BEHIND:
+        # Assign the ids now, broadcast straight away and store the message afterwards
+        message, notification = build_chat_message(chat, sender, recipient, message_text)
+        timestamp = timezone.now()
+    else:
+        # Save message, update the chat and create the notification in one round trip
+        message, notification = await save_chat_message(chat, sender, recipient, message_text)
+        timestamp = message.timestamp
+
+    # Clients key messages on the stored id, e.g. for read receipts
+    message_data = {
+        'type': 'chat_message',
+        'chat_id': str(chat.id),
+        'id': str(message.id),
+        'sender_id': sender.id,
+        'timestamp': timestamp.isoformat(),
+        'message_text': message_text,
+        'is_read': False
+    }
+
+    # Send notification to the other user
+    await send_notification(recipient.id, {
+        'id': str(notification.id),
+        'type': 'NEW_MESSAGE',
+        'chat_id': str(chat.id),
+        'message': message_text,
+        'sender_name': f"{sender.first_name} {sender.last_name}"
+    })
+
+    # Broadcast the message to the chat group
+    await channel_layer.group_send(
+        chat_group_name,
+        message_data
+    )
+
+    if settings.CHAT_WRITE_BEHIND:
+        await chat_message_writer.enqueue(message, notification)
+
+class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket consumer for handling real-time chat functionality.
+    Manages connections, message sending/receiving, and typing status updates.
+    """
+    
     async def connect(self):
         """
         Handles WebSocket connection initialization.
@@ -106,6 +494,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
             # Set up user information and get the other participant
             self.user_id = self.user.id
+            self.typing = TypingIndicator(self.chat_id, self.user_id)
+            self.read_receipts = ReadReceiptBuffer(self.chat_id, self.user_id)
             self.other_user = await database_sync_to_async(lambda: self.chat.user2 if self.chat.user1 == self.user else self.chat.user1)()
 
             # Add user to the chat group
@@ -130,7 +520,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         Wrapped in database_sync_to_async as it performs database operations.
         """
         try:
-            return Chat.objects.get(id=chat_id)
+            return Chat.objects.select_related('user1', 'user2').get(id=chat_id)
         except Chat.DoesNotExist:
             return None
 
@@ -147,22 +537,22 @@ class ChatConsumer(AsyncWebsocketConsumer):
         Handles WebSocket disconnection.
         Sends typing status update and removes user from the chat group.
         """
+        if hasattr(self, 'typing'):
+            # Send stopped typing status when user disconnects while typing
+            await self.typing.stop()
+        if hasattr(self, 'read_receipts'):
+            await self.read_receipts.flush()
         if hasattr(self, 'chat_group_name'):
-            # Send stopped typing status when user disconnects
-            await self.channel_layer.group_send(
-                self.chat_group_name,
-                {
-                    'type': 'typing_status',
-                    'user_id': self.user_id,
-                    'is_typing': False
-                }
-            )
             # Remove user from chat group
             await self.channel_layer.group_discard(
                 self.chat_group_name,
                 self.channel_name
             )
 
+            # Make sure this user's pending messages are stored before the socket goes away
+            if settings.CHAT_WRITE_BEHIND:
+                await chat_message_writer.flush()
+
     async def receive(self, text_data):
         """
         Handles incoming WebSocket messages.
@@ -172,67 +562,21 @@ class ChatConsumer(AsyncWebsocketConsumer):
             data = json.loads(text_data)
             message_type = data.get('type')
 
-            # Handle typing status updates
+            # Handle typing status updates, only changes are broadcast
             if message_type == 'typing_status':
-                await self.channel_layer.group_send(
-                    self.chat_group_name,
-                    {
-                        'type': 'typing_status',
-                        'sender_id': str(self.user.id),
-                        'is_typing': data.get('is_typing', False)
-                    }
-                )
+                await self.typing.update(data.get('is_typing', False))
                 return
 
-            # Handle chat messages
-            message_text = data.get('message')
-            
-            message_data = {
-                'type': 'chat_message',
-                'id': data.get('id'),
-                'sender_id': self.user.id,
-                'timestamp': data.get('timestamp') or str(datetime.datetime.now()),
-                'message_text': message_text,
-                'is_read': False
-            }
-
-            # Send "stopped typing" status when a message is sent
-            await self.channel_layer.group_send(
-                self.chat_group_name,
-                {
-                    'type': 'typing_status',
-                    'user_id': self.user_id,
-                    'is_typing': False
-                }
-            )
-
-            # Save message to database
-            chat_instance = await database_sync_to_async(Chat.objects.get)(id=self.chat_id)
-            message = await database_sync_to_async(ChatMessage.objects.create)(
-                chat=chat_instance,
-                sender=self.user,
-                message_text=message_text
-            )
+            # Handle read receipts, applied in batches
+            if message_type == 'mark_read':
+                self.read_receipts.mark(data['message_id'])
+                return
 
-            # Update the chat's last_updated_date
-            await database_sync_to_async(chat_instance.save)()
+            # Sending a message ends typing
+            await self.typing.stop()
 
-            # Create and send notification to the other user
-            notification = await self.create_message_notification(message, self.other_user)
-            
-            await send_notification(self.other_user.id, {
-                'id': str(notification.id),
-                'type': 'NEW_MESSAGE',
-                'chat_id': str(self.chat_id),
-                'message': message_text,
-                'sender_name': f"{self.user.first_name} {self.user.last_name}"
-            })
-
-            # Broadcast the message to the chat group
-            await self.channel_layer.group_send(
-                self.chat_group_name,
-                message_data
-            )
+            # Handle chat messages
+            await post_chat_message(self.chat, self.user, self.other_user, data)
 
         except Exception as e:
             logging.error(f"Error processing message: {e}")
@@ -251,6 +595,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'is_read': event['is_read']
         }))
 
+    async def chat_message_failed(self, event):
+        """
+        Tells the client a message broadcast earlier was not stored.
+        """
+        await self.send(text_data=json.dumps({
+            'type': 'message_failed',
+            'id': event['id'],
+            'sender_id': event['sender_id']
+        }))
+
     async def typing_status(self, event):
         """
         Sends typing status update to WebSocket.
@@ -264,6 +618,17 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 'is_typing': event.get('is_typing', False)
             }))
 
+    async def read_receipt(self, event):
+        """
+        Tells the client the other participant has read messages up to event['message_id'].
+        """
+        if event['reader_id'] != str(self.user_id):
+            await self.send(text_data=json.dumps({
+                'type': 'read_receipt',
+                'reader_id': event['reader_id'],
+                'message_id': event['message_id']
+            }))
+
 class NotificationConsumer(AsyncWebsocketConsumer):
     """
     WebSocket consumer for handling real-time notifications.
@@ -303,4 +668,217 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         """
         await self.send(text_data=json.dumps({
             'notification': event['notification']
-        }))
\ No newline at end of file
+        }))
+
+class MultiplexConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket consumer that carries all of a user's chats and notifications over one connection.
+    The client subscribes to chats with control frames and every outgoing event is tagged
+    with its stream ('chat', 'notifications' or 'control') so the client can route it.
+
+    Control frames:
+        {"action": "subscribe", "chat_id": ...}
+        {"action": "unsubscribe", "chat_id": ...}
+        {"action": "send_message", "chat_id": ..., "message": ..., "id": ..., "timestamp": ...}
+        {"action": "typing_status", "chat_id": ..., "is_typing": ...}
+        {"action": "mark_read", "chat_id": ..., "message_id": ...}
+    """
+
+    async def connect(self):
+        """
+        Authenticates the user and joins their notification group.
+        Chat groups are joined later through subscribe frames.
+        """
+        self.user = self.scope.get('user', None)
+        if not self.user or not self.user.is_authenticated:
+            logging.error("User is not authenticated")
+            await self.close()
+            return
+
+        # chat_id -> (chat, other participant, typing indicator, read receipts)
+        self.subscriptions = {}
+        self.notification_group_name = f"user_{self.user.id}_notifications"
+        await self.channel_layer.group_add(
+            self.notification_group_name,
+            self.channel_name
+        )
+
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        """
+        Leaves every chat group and the notification group.
+        """
+        if not hasattr(self, 'subscriptions'):
+            return
+
+        for chat_id in list(self.subscriptions):
+            await self.unsubscribe(chat_id)
+        await self.channel_layer.group_discard(
+            self.notification_group_name,
+            self.channel_name
+        )
+
+        # Make sure this user's pending messages are stored before the socket goes away
+        if settings.CHAT_WRITE_BEHIND:
+            await chat_message_writer.flush()
+
+    async def receive(self, text_data):
+        """
+        Dispatches control frames from the client.
+        """
+        try:
+            data = json.loads(text_data)
+            action = data.get('action')
+            chat_id = str(data.get('chat_id', ''))
+
+            if action == 'subscribe':
+                await self.subscribe(chat_id)
+            elif action == 'unsubscribe':
+                await self.unsubscribe(chat_id)
+                await self.send_control('unsubscribed', chat_id)
+            elif action in ('send_message', 'typing_status', 'mark_read'):
+                if chat_id not in self.subscriptions:
+                    await self.send_control('error', chat_id, 'Not subscribed to this chat')
+                    return
+
+                chat, other_user, typing, read_receipts = self.subscriptions[chat_id]
+                if action == 'send_message':
+                    await typing.stop()
+                    await post_chat_message(chat, self.user, other_user, data)
+                elif action == 'mark_read':
+                    read_receipts.mark(data['message_id'])
+                else:
+                    await typing.update(data.get('is_typing', False))
+            else:
+                await self.send_control('error', chat_id, f"Unknown action: {action}")
+
+        except Exception as e:
+            logging.error(f"Error processing multiplexed frame: {e}")
+            return
+
+    async def subscribe(self, chat_id):
+        """
+        Joins a chat group after checking the user takes part in the chat.
+        """
+        if chat_id in self.subscriptions:
+            await self.send_control('subscribed', chat_id)
+            return
+
+        chat = await self.get_chat(chat_id)
+        if not chat or self.user.id not in (chat.user1_id, chat.user2_id):
+            await self.send_control('error', chat_id, 'Chat not found')
+            return
+
+        other_user = chat.user2 if chat.user1_id == self.user.id else chat.user1
+        self.subscriptions[chat_id] = (
+            chat,
+            other_user,
+            TypingIndicator(chat_id, self.user.id),
+            ReadReceiptBuffer(chat_id, self.user.id),
+        )
+        await self.channel_layer.group_add(
+            f"chat_{chat_id}",
+            self.channel_name
+        )
+        await self.send_control('subscribed', chat_id)
+
+    async def unsubscribe(self, chat_id):
+        """
+        Leaves a chat group, telling the other participant if the user stopped typing
+        and applying any pending read receipts.
+        """
+        subscription = self.subscriptions.pop(chat_id, None)
+        if subscription is None:
+            return
+
+        _, _, typing, read_receipts = subscription
+        await typing.stop()
+        await read_receipts.flush()
+        await self.channel_layer.group_discard(
+            f"chat_{chat_id}",
+            self.channel_name
+        )
+
+    @database_sync_to_async
+    def get_chat(self, chat_id):
+        """
+        Retrieves chat instance with both participants from database.
+        """
+        try:
+            return Chat.objects.select_related('user1', 'user2').get(id=chat_id)
+        except (Chat.DoesNotExist, ValueError, ValidationError):
+            return None
+
+    async def send_control(self, action, chat_id, error=None):
+        payload = {
+            'stream': 'control',
+            'action': action,
+            'chat_id': chat_id,
+        }
+        if error:
+            payload['error'] = error
+        await self.send(text_data=json.dumps(payload))
+
+    async def chat_message(self, event):
+        """
+        Forwards a chat message from any subscribed chat, tagged with its chat id.
+        """
+        await self.send(text_data=json.dumps({
+            'stream': 'chat',
+            'chat_id': event['chat_id'],
+            'type': 'chat_message',
+            'id': event['id'],
+            'sender_id': event['sender_id'],
+            'message_text': event['message_text'],
+            'timestamp': event['timestamp'],
+            'is_read': event['is_read']
+        }))
+
+    async def chat_message_failed(self, event):
+        """
+        Forwards the id of a message that was broadcast but not stored, tagged with its chat id.
+        """
+        await self.send(text_data=json.dumps({
+            'stream': 'chat',
+            'chat_id': event['chat_id'],
+            'type': 'message_failed',
+            'id': event['id'],
+            'sender_id': event['sender_id']
+        }))
+
+    async def typing_status(self, event):
+        """
+        Forwards typing status updates from any subscribed chat, tagged with its chat id.
+        """
+        sender_id = event.get('sender_id', None)
+        if sender_id is not None and sender_id != str(self.user.id):
+            await self.send(text_data=json.dumps({
+                'stream': 'chat',
+                'chat_id': event['chat_id'],
+                'type': 'typing_status',
+                'sender_id': sender_id,
+                'is_typing': event.get('is_typing', False)
+            }))
+
+    async def read_receipt(self, event):
+        """
+        Forwards the other participant's read receipts, tagged with the chat id.
+        """
+        if event['reader_id'] != str(self.user.id):
+            await self.send(text_data=json.dumps({
+                'stream': 'chat',
+                'chat_id': event['chat_id'],
+                'type': 'read_receipt',
+                'reader_id': event['reader_id'],
+                'message_id': event['message_id']
+            }))
+
+    async def notification(self, event):
+        """
+        Forwards notifications from the user's notification group.
+        """
+        await self.send(text_data=json.dumps({
+            'stream': 'notifications',
+            'notification': event['notification']
+        }))
@@ -0,0 +1,277 @@
+import asyncio
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    message BLOB NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS channel_messages_channel_idx ON channel_messages (channel, id);
+CREATE TABLE IF NOT EXISTS channel_groups (
+    group_name TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (group_name, channel)
+);
+"""
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    """
+    Channel layer shared by every worker process on one host through a SQLite
+    database in WAL mode, so no external broker is needed.
+
+    Each process runs a single poller that collects the messages for all of the
+    channels it is receiving on with one query, backing off from `poll_interval`
+    to `max_poll_interval` while idle. Queries run on one dedicated thread per
+    layer, so waiting for another process's write lock never blocks the event
+    loop. Messages are pickled, so the database file must only be writable by
+    the server's own processes.
+    """
+
+    extensions = ["groups", "flush"]
+
+    def __init__(
+        self,
+        path="channels.sqlite3",
+        expiry=60,
+        group_expiry=86400,
+        capacity=100,
+        channel_capacity=None,
+        poll_interval=0.002,
+        max_poll_interval=0.05,
+        **kwargs,
+    ):
+        super().__init__(
+            expiry=expiry,
+            capacity=capacity,
+            channel_capacity=channel_capacity,
+            **kwargs,
+        )
+        self.path = str(path)
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._local = threading.local()
+        self._executor = None
+        self._receivers = {}  # channel -> asyncio.Queue of messages for this process
+        self._poller = None
+        self._wakeup = None
+        self._loop = None
+        self._last_cleanup = 0
+
+    # Database access
+
+    async def _run(self, function, *args):
+        """
+        Runs a blocking database call on the layer's thread.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-channel-layer")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _execute(self, sql, parameters=()):
+        return self._connection().execute(sql, parameters).fetchall()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _insert(self, channels, message):
+        """
+        Adds the message to every channel that is below capacity.
+        Returns the channels that were full.
+        """
+        now = time.time()
+        payload = pickle.dumps(message)
+        connection = self._connection()
+        placeholders = ",".join("?" * len(channels))
+
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            pending = dict(connection.execute(
+                f"SELECT channel, COUNT(*) FROM channel_messages "
+                f"WHERE channel IN ({placeholders}) AND expires > ? GROUP BY channel",
+                (*channels, now),
+            ).fetchall())
+            full = [channel for channel in channels if pending.get(channel, 0) >= self.get_capacity(channel)]
+            connection.executemany(
+                "INSERT INTO channel_messages (channel, message, expires) VALUES (?, ?, ?)",
+                [(channel, payload, now + self.expiry) for channel in channels if channel not in full],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return full
+
+    def _take(self, channels):
+        """
+        Removes and returns every live message for the given channels, oldest first.
+        """
+        now = time.time()
+        connection = self._connection()
+        placeholders = ",".join("?" * len(channels))
+        rows = connection.execute(
+            f"DELETE FROM channel_messages WHERE channel IN ({placeholders}) AND expires > ? "
+            f"RETURNING id, channel, message",
+            (*channels, now),
+        ).fetchall()
+
+        if now - self._last_cleanup > self.expiry:
+            self._last_cleanup = now
+            connection.execute("DELETE FROM channel_messages WHERE expires <= ?", (now,))
+            connection.execute("DELETE FROM channel_groups WHERE expires <= ?", (now,))
+
+        return [(channel, pickle.loads(message)) for _, channel, message in sorted(rows)]
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        """
+        Send a message onto a (general or specific) channel.
+        """
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        assert "__asgi_channel__" not in message
+
+        if await self._run(self._insert, [channel], message):
+            raise ChannelFull(channel)
+        self._wake(channel)
+
+    async def receive(self, channel):
+        """
+        Receive the first message that arrives on the channel.
+        """
+        self.require_valid_channel_name(channel)
+        self._ensure_poller()
+
+        queue = self._receivers.setdefault(channel, asyncio.Queue())
+        self._wakeup.set()
+        try:
+            return await queue.get()
+        finally:
+            if queue.empty():
+                self._receivers.pop(channel, None)
+
+    async def new_channel(self, prefix="specific."):
+        """
+        Returns a new channel name that can be used by something in our
+        process as a specific channel.
+        """
+        return f"{prefix}.sqlite!{uuid.uuid4().hex}"
+
+    # Polling
+
+    def _ensure_poller(self):
+        loop = asyncio.get_running_loop()
+        if self._poller is None or self._poller.done() or self._loop is not loop:
+            self._loop = loop
+            self._receivers = {}
+            self._wakeup = asyncio.Event()
+            self._poller = loop.create_task(self._poll())
+
+    def _wake(self, channel):
+        # Messages sent to a channel received by this event loop skip the poll delay
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if loop is self._loop and channel in self._receivers:
+            self._wakeup.set()
+
+    async def _poll(self):
+        interval = self.poll_interval
+        while True:
+            if self._receivers:
+                messages = await self._run(self._take, list(self._receivers))
+                for channel, message in messages:
+                    # The rows are already deleted, so keep them for the next receive
+                    # even if the channel's receiver finished while the take ran
+                    self._receivers.setdefault(channel, asyncio.Queue()).put_nowait(message)
+                interval = self.poll_interval if messages else min(interval * 2, self.max_poll_interval)
+            else:
+                interval = self.max_poll_interval
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # Groups extension
+
+    async def group_add(self, group, channel):
+        """
+        Adds the channel name to a group.
+        """
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._run(
+            self._execute,
+            "INSERT OR REPLACE INTO channel_groups (group_name, channel, expires) VALUES (?, ?, ?)",
+            (group, channel, time.time() + self.group_expiry),
+        )
+
+    async def group_discard(self, group, channel):
+        """
+        Removes the channel name from a group.
+        """
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._run(
+            self._execute,
+            "DELETE FROM channel_groups WHERE group_name = ? AND channel = ?",
+            (group, channel),
+        )
+
+    async def group_send(self, group, message):
+        """
+        Sends the message to every channel in the group. Full channels are skipped.
+        """
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+
+        channels = [
+            channel for (channel,) in await self._run(
+                self._execute,
+                "SELECT channel FROM channel_groups WHERE group_name = ? AND expires > ?",
+                (group, time.time()),
+            )
+        ]
+        if not channels:
+            return
+
+        await self._run(self._insert, channels, message)
+        for channel in channels:
+            self._wake(channel)
+
+    # Flush extension
+
+    async def flush(self):
+        await self._run(self._execute, "DELETE FROM channel_messages")
+        await self._run(self._execute, "DELETE FROM channel_groups")
+        self._receivers = {}
+
+    async def close(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,96 @@
+import asyncio
+import statistics
+import time
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncRequestFactory
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+from api.models import UserProfile
+from api.views.ViewsAppointments import get_schedule, get_schedule_async
+from api.views.ViewsChats import UserChatsView, user_chats_async
+from api.views.ViewsDashboard import (
+    DoctorNextAppointmentsView,
+    PatientNextAppointmentView,
+    doctor_next_appointment_async,
+    patient_next_appointment_async,
+)
+from api.views.ViewsUsers import UserInfoView, user_info_async
+
+
+def get_endpoints(role):
+    """
+    Returns (name, sync view, async view, path, params) for every endpoint the role can call.
+    """
+    endpoints = [
+        ("user-info", UserInfoView.as_view(), user_info_async, "/api/user-info/", {}),
+        ("schedule", get_schedule, get_schedule_async, "/api/schedule/", {"date": timezone.now().date().isoformat()}),
+        ("chats", UserChatsView.as_view(), user_chats_async, "/api/chats/", {}),
+    ]
+    if role == "doctor":
+        endpoints.append(("doctor-next", DoctorNextAppointmentsView.as_view(), doctor_next_appointment_async,
+                          "/api/doctor/appointments/next/", {}))
+    if role == "patient":
+        endpoints.append(("patient-next", PatientNextAppointmentView.as_view(), patient_next_appointment_async,
+                          "/api/patient/next-appointment/", {}))
+    return endpoints
+
+
+async def run_requests(view, path, params, token, total, concurrency):
+    """
+    Sends `total` GET requests to the view from `concurrency` concurrent clients.
+    Returns the latencies and the elapsed time.
+    """
+    factory = AsyncRequestFactory()
+    latencies = []
+
+    async def client(count):
+        for _ in range(count):
+            request = factory.get(path, params, headers={"Authorization": f"Bearer {token}"})
+            started = time.perf_counter()
+            response = await view(request)
+            if hasattr(response, "render"):
+                response.render()
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                raise CommandError(f"{path} returned {response.status_code}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(total // concurrency) for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures requests/second of the sync and async versions of the hot read endpoints. "
+        "Sync views are run through sync_to_async like Django's ASGI handler does."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="User whose token is used for the requests")
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+        parser.add_argument("--requests", type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            user = UserProfile.objects.get(email=options["email"])
+        except UserProfile.DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+        token = str(AccessToken.for_user(user))
+
+        self.stdout.write(f"{'endpoint':<14} {'mode':<6} {'clients':>7} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>8}")
+        for name, sync_view, async_view, path, params in get_endpoints(user.role):
+            for concurrency in options["concurrency"]:
+                for mode, view in (("sync", sync_to_async(sync_view)), ("async", async_view)):
+                    latencies, elapsed = asyncio.run(
+                        run_requests(view, path, params, token, options["requests"], concurrency)
+                    )
+                    self.report(name, mode, concurrency, latencies, elapsed)
+
+    def report(self, name, mode, concurrency, latencies, elapsed):
+        latencies = sorted(latencies)
+        p50 = statistics.median(latencies) * 1000
+        p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+        self.stdout.write(
+            f"{name:<14} {mode:<6} {concurrency:>7} {p50:>8.2f} {p95:>8.2f} {len(latencies) / elapsed:>8.0f}"
+        )
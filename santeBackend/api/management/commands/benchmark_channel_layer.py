@@ -0,0 +1,105 @@
+import asyncio
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from channels.layers import InMemoryChannelLayer
+from api.layers import SQLiteChannelLayer
+
+GROUP = "benchmark"
+
+
+async def receive_messages(layer, channel, count):
+    latencies = []
+    for _ in range(count):
+        message = await layer.receive(channel)
+        latencies.append(time.time() - message["sent"])
+    return latencies
+
+
+async def send_messages(layer, count):
+    for index in range(count):
+        await layer.group_send(GROUP, {"type": "benchmark", "index": index, "sent": time.time()})
+        # Yield so in-process receivers can run between sends
+        await asyncio.sleep(0)
+
+
+def sqlite_worker(path, count, ready, results):
+    """
+    Worker process: joins the benchmark group and reports its receive latencies.
+    """
+    async def run():
+        layer = SQLiteChannelLayer(path=path, capacity=count + 1)
+        channel = await layer.new_channel()
+        await layer.group_add(GROUP, channel)
+        ready.put(True)
+        latencies = await receive_messages(layer, channel, count)
+        await layer.close()
+        return latencies
+
+    results.put(asyncio.run(run()))
+
+
+class Command(BaseCommand):
+    help = "Measures group_send fan-out latency and throughput of the in-memory and SQLite channel layers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+        parser.add_argument("--messages", type=int, default=500)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'backend':<8} {'workers':>7} {'p50 ms':>8} {'p95 ms':>8} {'deliveries/s':>13}")
+        for workers in options["workers"]:
+            self.report("memory", workers, *self.run_memory(workers, options["messages"]))
+            self.report("sqlite", workers, *self.run_sqlite(workers, options["messages"]))
+
+    def report(self, backend, workers, latencies, elapsed):
+        latencies = sorted(latencies)
+        p50 = statistics.median(latencies) * 1000
+        p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+        self.stdout.write(f"{backend:<8} {workers:>7} {p50:>8.2f} {p95:>8.2f} {len(latencies) / elapsed:>13.0f}")
+
+    def run_memory(self, workers, count):
+        """
+        The in-memory layer cannot cross processes, so its receivers are tasks in this process.
+        """
+        async def run():
+            layer = InMemoryChannelLayer(capacity=count + 1)
+            channels = [await layer.new_channel() for _ in range(workers)]
+            for channel in channels:
+                await layer.group_add(GROUP, channel)
+
+            started = time.time()
+            receivers = [asyncio.create_task(receive_messages(layer, channel, count)) for channel in channels]
+            await send_messages(layer, count)
+            results = await asyncio.gather(*receivers)
+            return [latency for latencies in results for latency in latencies], time.time() - started
+
+        return asyncio.run(run())
+
+    def run_sqlite(self, workers, count):
+        context = multiprocessing.get_context("spawn")
+        ready, results = context.Queue(), context.Queue()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "channels.sqlite3")
+            processes = [
+                context.Process(target=sqlite_worker, args=(path, count, ready, results))
+                for _ in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            for _ in processes:
+                ready.get()
+
+            started = time.time()
+            asyncio.run(send_messages(SQLiteChannelLayer(path=path, capacity=count + 1), count))
+            latencies = [latency for _ in processes for latency in results.get()]
+            elapsed = time.time() - started
+
+            for process in processes:
+                process.join()
+
+        return latencies, elapsed
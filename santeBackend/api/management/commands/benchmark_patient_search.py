@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from api import search
+from api.models import Patient, UserProfile
+
+FIRST_NAMES = ["Ali", "Fatima", "Hassan", "Maryam", "Yusuf", "Noor", "Omar", "Layla", "Khalid", "Sara",
+               "Ahmed", "Zainab", "Ibrahim", "Huda", "Salman", "Reem", "Jassim", "Amina", "Faisal", "Dana"]
+LAST_NAMES = ["Alfardan", "Almahmood", "Alkhalifa", "Alsayed", "Janahi", "Kanoo", "Almoayyed", "Fakhro",
+              "Zayani", "Alaali", "Bukhammas", "Alawadhi", "Nass", "Alghanim", "Shirawi", "Kooheji"]
+QUERIES = ["al", "fat", "hassan al", "maryam kanoo", "850", "patient1234", "mrn-00042", "zayani"]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures patient search latency with the search index and with the previous "
+        "icontains scan. Synthetic patients are added in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--patients", type=int, default=500_000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--limit", type=int, default=search.SEARCH_RESULT_LIMIT)
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("The patient search index is only available on SQLite.")
+
+        try:
+            with transaction.atomic():
+                self.seed(options["patients"])
+                self.stdout.write(f"{'query':<14} {'mode':<6} {'p50 ms':>8} {'p95 ms':>8} {'results':>8}")
+                for query in QUERIES:
+                    self.run("index", query, lambda: search.search(query, options["limit"]), options["repeat"])
+                    self.run("scan", query, lambda: self.scan(query, options["limit"]), max(options["repeat"] // 4, 5))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def seed(self, count):
+        started = time.perf_counter()
+        rng = random.Random(0)
+        batch_size = 5000
+        for offset in range(0, count, batch_size):
+            users = UserProfile.objects.bulk_create([
+                UserProfile(
+                    email=f"patient{index}@benchmark.test",
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    role="patient",
+                )
+                for index in range(offset, min(offset + batch_size, count))
+            ])
+            Patient.objects.bulk_create([
+                Patient(
+                    user=user,
+                    CPR_number=f"{rng.randrange(10**8, 10**9)}",
+                    medical_record_id=f"MRN-{user.pk:08d}",
+                )
+                for user in users
+            ])
+        # bulk_create sends no signals, so index the new rows in one pass
+        search.rebuild_index()
+        self.stdout.write(f"Seeded {count} patients in {time.perf_counter() - started:.1f}s")
+
+    @staticmethod
+    def scan(query, limit):
+        """
+        The predicate search_patients used before the search index.
+        """
+        name_parts = query.split()
+        if len(name_parts) > 1:
+            predicate = Q(first_name__icontains=name_parts[0], last_name__icontains=name_parts[-1])
+        else:
+            predicate = Q(first_name__icontains=query) | Q(last_name__icontains=query)
+        predicate |= Q(email__icontains=query) | Q(email__startswith=query) | Q(email__iexact=query)
+        predicate |= Q(patient__CPR_number__icontains=query)
+        return list(
+            UserProfile.objects.filter(predicate, role="patient")
+            .values("id", "first_name", "last_name", "email", "patient__CPR_number")[:limit]
+        )
+
+    def run(self, mode, query, function, repeat):
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            results = function()
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000
+        self.stdout.write(f"{query:<14} {mode:<6} {p50:>8.2f} {p95:>8.2f} {len(results):>8}")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from api.models import Appointment, DailyAppointmentStats
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the DailyAppointmentStats rollup table from the Appointment table."
+
+    def handle(self, *args, **options):
+        rows = (
+            Appointment.objects.order_by()
+            .values('appointment_date', 'doctor_id', 'status')
+            .annotate(count=Count('id'))
+        )
+
+        with transaction.atomic():
+            DailyAppointmentStats.objects.all().delete()
+            created = DailyAppointmentStats.objects.bulk_create(
+                [
+                    DailyAppointmentStats(
+                        date=row['appointment_date'],
+                        doctor_id=row['doctor_id'],
+                        status=row['status'],
+                        count=row['count'],
+                    )
+                    for row in rows.iterator()
+                ],
+                batch_size=1000,
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(created)} daily appointment stats rows."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api import search
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the patient search index from the UserProfile and Patient tables."
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("The patient search index is only available on SQLite.")
+
+        with transaction.atomic():
+            count = search.rebuild_index()
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} patients."))
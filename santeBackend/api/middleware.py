@@ -1,6 +1,10 @@
 import logging
+import threading
+import time
+from collections import OrderedDict
 from urllib.parse import parse_qs
 from channels.middleware import BaseMiddleware
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.db import close_old_connections
 from rest_framework_simplejwt.tokens import AccessToken
@@ -10,12 +14,80 @@ from rest_framework.exceptions import AuthenticationFailed
 
 logger = logging.getLogger(__name__)
 
+class ValidatedTokenCache:
+    """
+    Bounded cache of validated access tokens, keyed by the token string.
+    Entries expire with the token and are evicted least recently used first.
+    Only the token is cached: its user is loaded from the database on every
+    handshake, so edits and deactivations made by any process apply at once.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # token -> validated token
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """
+        Returns the validated token for this exact token string, or None.
+        """
+        with self._lock:
+            validated_token = self._entries.get(token)
+            if validated_token is None:
+                return None
+
+            if validated_token.get('exp', 0) <= time.time():
+                del self._entries[token]
+                return None
+
+            self._entries.move_to_end(token)
+            return validated_token
+
+    def set(self, token, validated_token):
+        """
+        Stores a validated token until it expires.
+        """
+        if not validated_token.get('exp'):
+            return
+
+        with self._lock:
+            self._entries[token] = validated_token
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+token_cache = ValidatedTokenCache(max_size=getattr(settings, 'WEBSOCKET_AUTH_CACHE_SIZE', 1024))
+
+def validate_token(token):
+    """
+    Validates an access token and returns its active user. Reconnects with an
+    already validated token skip signature verification through token_cache.
+    Returns None if the token is invalid or the user is inactive.
+    """
+    try:
+        jwt_auth = JWTAuthentication()
+        validated_token = token_cache.get(token)
+        if validated_token is None:
+            validated_token = jwt_auth.get_validated_token(token)
+            token_cache.set(token, validated_token)
+
+        user = jwt_auth.get_user(validated_token)
+        if not user or not user.is_active:
+            return None
+
+        return user
+
+    except Exception as e:
+        logging.error(f"Error authenticating user: {str(e)}")
+        return None
+
 class SimpleJWTAuthMiddleware(BaseMiddleware):
     async def __call__(self, scope, receive, send):
         try:
-            # Close old database connections
-            await sync_to_async(close_old_connections)()
-
             # Extract token from query string
             query_string = scope.get('query_string', b'').decode('utf-8')
             token = await self.extract_token(query_string)
@@ -57,14 +129,5 @@ class SimpleJWTAuthMiddleware(BaseMiddleware):
     @staticmethod
     @sync_to_async
     def get_authenticated_user(token: str):
-        try:
-            close_old_connections()
-            jwt_auth = JWTAuthentication()
-            validated_token = jwt_auth.get_validated_token(token)
-            user = jwt_auth.get_user(validated_token)
-            
-            return user if user and user.is_active else None
-            
-        except Exception as e:
-            logging.error(f"Error authenticating user: {str(e)}")
-            return None
\ No newline at end of file
+        close_old_connections()
+        return validate_token(token)
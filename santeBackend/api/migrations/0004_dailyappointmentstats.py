@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-18 14:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_daily_appointment_stats(apps, schema_editor):
+    Appointment = apps.get_model('api', 'Appointment')
+    DailyAppointmentStats = apps.get_model('api', 'DailyAppointmentStats')
+
+    rows = (
+        Appointment.objects.order_by()
+        .values('appointment_date', 'doctor_id', 'status')
+        .annotate(count=Count('id'))
+    )
+    DailyAppointmentStats.objects.bulk_create(
+        [
+            DailyAppointmentStats(
+                date=row['appointment_date'],
+                doctor_id=row['doctor_id'],
+                status=row['status'],
+                count=row['count'],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_alter_patient_blood_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAppointmentStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('Scheduled', 'Scheduled'), ('Completed', 'Completed'), ('Cancelled', 'Cancelled'), ('No Show', 'No Show')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_appointment_stats', to='api.employee')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'doctor', 'status'), name='unique_daily_appointment_stats')],
+            },
+        ),
+        migrations.RunPython(populate_daily_appointment_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2 on 2026-10-18 15:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_unread_counters(apps, schema_editor):
+    Chat = apps.get_model('api', 'Chat')
+    ChatMessage = apps.get_model('api', 'ChatMessage')
+    Notification = apps.get_model('api', 'Notification')
+    NotificationCounter = apps.get_model('api', 'NotificationCounter')
+
+    def unread_from(sender):
+        return Coalesce(Subquery(
+            ChatMessage.objects.filter(chat=OuterRef('pk'), is_read=False, sender_id=OuterRef(sender))
+            .order_by().values('chat').annotate(count=Count('id')).values('count')
+        ), 0)
+
+    # user1's unread messages are the ones user2 sent, and the other way round
+    Chat.objects.update(
+        user1_unread_count=unread_from('user2_id'),
+        user2_unread_count=unread_from('user1_id'),
+    )
+
+    rows = (
+        Notification.objects.filter(is_read=False).order_by()
+        .values('recipient_id').annotate(count=Count('id'))
+    )
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=row['recipient_id'], unread=row['count']) for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_add_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='user1_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='user2_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_unread_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 15:14
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_report_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='generated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='stats',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='reportjob',
+            index=models.Index(fields=['-created_at'], name='report_job_created_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-18 18:20
+
+from django.db import migrations
+
+
+def create_patient_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE api_patient_search USING fts5("
+        "first_name, last_name, email, cpr_number, medical_record_id, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3')"
+    )
+    schema_editor.execute(
+        '''
+        INSERT INTO api_patient_search (rowid, first_name, last_name, email, cpr_number, medical_record_id)
+        SELECT u.id, COALESCE(u.first_name, ''), COALESCE(u.last_name, ''), COALESCE(u.email, ''),
+               COALESCE(p."CPR_number", ''), COALESCE(p.medical_record_id, '')
+        FROM api_userprofile u
+        LEFT JOIN api_patient p ON p.user_id = u.id
+        WHERE u.role = 'patient'
+        '''
+    )
+
+
+def drop_patient_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS api_patient_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_report_snapshots'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_patient_search_index, drop_patient_search_index),
+    ]
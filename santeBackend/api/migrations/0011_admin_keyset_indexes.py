@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_patient_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='log',
+            name='log_timestamp_idx',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['appointment_date', 'appointment_time', 'id'], name='appointment_date_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['timestamp', 'id'], name='log_timestamp_id_idx'),
+        ),
+    ]
@@ -3,6 +3,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 import uuid
 
 
@@ -154,6 +156,15 @@ class Appointment(models.Model):
     notes = models.TextField(null=True, blank=True)
     follow_up_required = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'appointment_date'], name='appointment_doctor_date_idx'),
+            models.Index(fields=['patient', 'appointment_date'], name='appointment_patient_date_idx'),
+            models.Index(fields=['appointment_date', 'status'], name='appointment_date_status_idx'),
+            # The ordering of the admin appointment list
+            models.Index(fields=['appointment_date', 'appointment_time', 'id'], name='appointment_date_time_idx'),
+        ]
+
     def _str_(self):
         return f"Appointment {self.id} on {self.appointment_date} at {self.appointment_time}"
 
@@ -165,10 +176,17 @@ class Log(models.Model):
         related_name='logs'
     )
     action = models.CharField(max_length=100)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the record is created, not when the buffered writer saves it
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     ip_address = models.GenericIPAddressField()
     description = models.TextField()
 
+    class Meta:
+        indexes = [
+            # The ordering of the admin log list, walked backwards
+            models.Index(fields=['timestamp', 'id'], name='log_timestamp_id_idx'),
+        ]
+
     def _str_(self):
         return f"Log {self.id} by {self.user.email} at {self.timestamp}"
 
@@ -238,6 +256,13 @@ class Chat(models.Model):
     )
     created_date = models.DateTimeField(auto_now_add=True)
     last_updated_date = models.DateTimeField(auto_now=True)
+    # Messages each participant has not read yet, kept current by
+    # save_chat_message and mark_messages_read in api/consumers.py
+    user1_unread_count = models.PositiveIntegerField(default=0)
+    user2_unread_count = models.PositiveIntegerField(default=0)
+
+    def unread_count_for(self, user_id):
+        return self.user1_unread_count if self.user1_id == user_id else self.user2_unread_count
 
     def _str_(self):
         return f"Chat between {self.user1.email} and {self.user2.email}"
@@ -259,6 +284,12 @@ class ChatMessage(models.Model):
     message_text = models.TextField()
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['chat', 'timestamp'], name='chatmessage_chat_time_idx'),
+            models.Index(fields=['chat', 'is_read', 'sender'], name='chatmessage_chat_unread_idx'),
+        ]
+
     def _str_(self):
         return f"Message from {self.sender.email} at {self.timestamp}"
 
@@ -293,5 +324,92 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', 'is_read'], name='notification_recipient_idx'),
+        ]
+
     def __str__(self):
         return f"Notification for {self.recipient.email} - {self.notification_type}"
+
+
+class NotificationCounter(models.Model):
+    """
+    Number of unread notifications per user, kept current alongside the
+    Notification rows by the chat helpers in api/consumers.py.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_counter'
+    )
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+
+class ReportJob(models.Model):
+    """
+    A system report rendered in the background by `report_runner` in api/reports.py.
+    Finished jobs are kept as snapshots: the statistics as of `generated_at` and the PDF.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='report_jobs'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('queued', 'Queued'),
+            ('rendering', 'Rendering'),
+            ('completed', 'Completed'),
+            ('failed', 'Failed'),
+        ],
+        default='queued'
+    )
+    file_path = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    stats = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    generated_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at'], name='report_job_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Report {self.id} - {self.status}"
+
+
+class DailyAppointmentStats(models.Model):
+    """
+    Rollup of appointment counts per day, doctor and status.
+    Kept current by the Appointment signals in api/signals.py and rebuilt
+    from scratch with the `rebuild_appointment_stats` management command.
+    """
+    date = models.DateField()
+    doctor = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='daily_appointment_stats'
+    )
+    status = models.CharField(max_length=20, choices=APPOINTMENT_STATUS_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'doctor', 'status'],
+                name='unique_daily_appointment_stats'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.doctor_id} - {self.status}: {self.count}"
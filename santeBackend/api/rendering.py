@@ -0,0 +1,74 @@
+"""
+PDF rendering run in the report worker processes.
+
+This module must not import Django models: worker processes are started with
+the "spawn" method and import it without setting Django up. WeasyPrint is
+imported inside the functions, so web processes that never render a report
+do not load it or its native libraries.
+"""
+from pathlib import Path
+
+ASSETS_DIR = Path(__file__).resolve().parent / 'assets'
+BANNER_URL = (ASSETS_DIR / 'banner.png').as_uri()
+
+REPORT_CSS = '''
+    @page {
+        size: letter;
+        margin: 2.5cm;
+        @top-right {
+            content: "Page " counter(page) " of " counter(pages);
+        }
+    }
+    body { font-family: Arial, sans-serif; }
+    .header { text-align: center; margin-bottom: 30px; }
+    .section { margin-bottom: 25px; }
+    .stats-grid {
+        display: grid;
+        grid-template-columns: 1fr 1fr;
+        gap: 20px;
+    }
+    .stat-box {
+        border: 1px solid #ddd;
+        padding: 15px;
+        border-radius: 5px;
+    }
+    .chart-container { margin: 20px 0; }
+    table {
+        width: 100%;
+        border-collapse: collapse;
+    }
+    th, td {
+        border: 1px solid #ddd;
+        padding: 8px;
+        text-align: left;
+    }
+    th { background-color: #f5f5f5; }
+'''
+
+
+def local_url_fetcher(url, *args, **kwargs):
+    """
+    Only lets WeasyPrint load local files, so rendering never waits on the network.
+    """
+    from weasyprint import default_url_fetcher
+
+    if not url.startswith('file:'):
+        raise ValueError(f"Refusing to fetch {url} while rendering a report")
+    return default_url_fetcher(url, *args, **kwargs)
+
+
+def render_pdf(html_string, output_path=None):
+    """
+    Renders report HTML to PDF. Writes it to `output_path` and returns the path
+    if one is given, otherwise returns the PDF bytes.
+    """
+    from weasyprint import CSS, HTML
+
+    pdf = HTML(string=html_string, base_url=ASSETS_DIR.as_uri() + '/', url_fetcher=local_url_fetcher).write_pdf(
+        stylesheets=[CSS(string=REPORT_CSS)]
+    )
+    if output_path is None:
+        return pdf
+
+    Path(output_path).write_bytes(pdf)
+    return output_path
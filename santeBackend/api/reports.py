@@ -0,0 +1,248 @@
+"""
+System report generation. Kept out of api/utilities.py so that only the views
+that produce reports load it; WeasyPrint itself is only imported by
+api/rendering.py when a PDF is rendered.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+import atexit
+import logging
+import multiprocessing
+import threading
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from .models import Appointment, CarePlan, Employee, Log, Patient, Prescription, ReportJob, UserProfile
+from .rendering import BANNER_URL, render_pdf
+
+logger = logging.getLogger(__name__)
+
+
+class AdminSystemReportGenerator:
+    @staticmethod
+    def generate_system_stats():
+        """
+        Counts the report statistics with one query per table: grouped tables
+        return a row per group with any 30-day count folded in as a conditional
+        aggregate, and the totals are summed from those rows.
+        """
+        today = timezone.now()
+        thirty_days_ago = today - timedelta(days=30)
+        recent_appointments = Q(appointment_date__gte=thirty_days_ago.date())
+
+        # User Statistics
+        users_by_role = dict(UserProfile.objects.values_list('role').annotate(count=Count('id')).order_by())
+        total_users = sum(users_by_role.values())
+
+        # Patient Statistics
+        patients_by_blood_type = dict(Patient.objects.values_list('blood_type')
+                                      .annotate(count=Count('user_id')).order_by())
+        total_patients = sum(patients_by_blood_type.values())
+        patients_by_blood_type.pop(None, None)
+
+        # Employee Statistics
+        employees = Employee.objects.aggregate(
+            total=Count('user_id'),
+            doctors=Count('user_id', filter=Q(user__role='doctor')),
+            nurses=Count('user_id', filter=Q(user__role='nurse')),
+        )
+
+        # Appointment Statistics
+        appointments_by_status = {}
+        appointments_last_30_days = 0
+        for status, count, recent in (Appointment.objects.values_list('status')
+                                      .annotate(count=Count('id'), recent=Count('id', filter=recent_appointments))
+                                      .order_by()):
+            appointments_by_status[status] = count
+            appointments_last_30_days += recent
+        total_appointments = sum(appointments_by_status.values())
+
+        # Prescription Statistics
+        prescriptions = Prescription.objects.aggregate(
+            total=Count('id'),
+            recent=Count('id', filter=Q(appointment__appointment_date__gte=thirty_days_ago.date())),
+        )
+
+        # Care Plan Statistics
+        care_plans_by_type = dict(CarePlan.objects.values_list('care_plan_type')
+                                  .annotate(count=Count('id')).order_by())
+        total_care_plans = sum(care_plans_by_type.values())
+
+        # System Activity
+        logs = Log.objects.aggregate(
+            total=Count('id'),
+            recent=Count('id', filter=Q(timestamp__gte=thirty_days_ago)),
+        )
+
+        return {
+            'generated_at': today,
+            'user_stats': {
+                'total_users': total_users,
+                'users_by_role': users_by_role,
+            },
+            'patient_stats': {
+                'total_patients': total_patients,
+                'patients_by_blood_type': patients_by_blood_type,
+            },
+            'employee_stats': {
+                'total_employees': employees['total'],
+                'doctors': employees['doctors'],
+                'nurses': employees['nurses'],
+            },
+            'appointment_stats': {
+                'total_appointments': total_appointments,
+                'appointments_last_30_days': appointments_last_30_days,
+                'appointments_by_status': appointments_by_status,
+            },
+            'prescription_stats': {
+                'total_prescriptions': prescriptions['total'],
+                'prescriptions_last_30_days': prescriptions['recent'],
+            },
+            'care_plan_stats': {
+                'total_care_plans': total_care_plans,
+                'care_plans_by_type': care_plans_by_type,
+            },
+            'system_activity': {
+                'total_logs': logs['total'],
+                'logs_last_30_days': logs['recent'],
+            }
+        }
+
+    @staticmethod
+    def render_html(stats):
+        return render_to_string('admin_system_report.html', {'stats': stats, 'banner_path': BANNER_URL})
+
+    @staticmethod
+    def generate_pdf_report():
+        stats = AdminSystemReportGenerator.generate_system_stats()
+        return render_pdf(AdminSystemReportGenerator.render_html(stats))
+
+
+class ReportJobRunner:
+    """
+    Runs system report jobs in the background. Statistics are gathered on a
+    small thread pool in this process and the CPU-heavy WeasyPrint render runs
+    in a pool of worker processes, so neither blocks a request. Finished PDFs
+    are written to `REPORTS_DIR` and job progress is kept on the ReportJob row.
+
+    A job still queued or rendering after `render_timeout` seconds is taken to
+    have died with its process and is marked failed, as are the unfinished jobs
+    of a runner that is shut down.
+    """
+
+    IN_PROGRESS = ('queued', 'rendering')
+
+    def __init__(self, max_workers=2, render_timeout=300):
+        self.max_workers = max_workers
+        self.render_timeout = render_timeout
+        self._jobs = None
+        self._renderers = None
+        self._futures = {}
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def submit(self, user):
+        """
+        Queues a report for `user` and returns its ReportJob.
+        """
+        job = ReportJob.objects.create(requested_by=user)
+        with self._lock:
+            if self._jobs is None:
+                self._jobs = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='report-job')
+                self._renderers = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            self._futures[job.id] = self._jobs.submit(self._run, job.id)
+        return job
+
+    def latest(self, max_age):
+        """
+        Returns the newest report requested in the last `max_age` seconds that
+        has not failed, or None. A report still rendering is returned too, so
+        repeated requests wait for it instead of starting another render, unless
+        it is older than `render_timeout`.
+        """
+        self.fail_stale_jobs()
+        job = (ReportJob.objects
+               .filter(created_at__gte=timezone.now() - timedelta(seconds=max_age))
+               .exclude(status='failed')
+               .order_by('-created_at')
+               .first())
+        if job is not None and job.status == 'completed' and not Path(job.file_path).exists():
+            return None
+        return job
+
+    def fail_stale_jobs(self):
+        """
+        Marks jobs that have been queued or rendering for longer than
+        `render_timeout` as failed. Returns the number of jobs marked.
+        """
+        return ReportJob.objects.filter(
+            status__in=self.IN_PROGRESS,
+            created_at__lt=timezone.now() - timedelta(seconds=self.render_timeout)
+        ).update(status='failed', error='Report timed out', finished_at=timezone.now())
+
+    def wait(self, job_id, timeout=None):
+        """
+        Blocks until the job has finished.
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout)
+
+    def shutdown(self):
+        """
+        Stops the pools and marks the jobs they had not finished as failed, so
+        they are not waited on after the process is gone.
+        """
+        with self._lock:
+            jobs, renderers = self._jobs, self._renderers
+            self._jobs = self._renderers = None
+            unfinished = list(self._futures)
+        if jobs is None:
+            return
+
+        jobs.shutdown(wait=False, cancel_futures=True)
+        renderers.shutdown(wait=False, cancel_futures=True)
+        if unfinished:
+            try:
+                ReportJob.objects.filter(id__in=unfinished, status__in=self.IN_PROGRESS).update(
+                    status='failed', error='Server shut down before the report was finished',
+                    finished_at=timezone.now()
+                )
+            except Exception:
+                logger.exception("Error marking unfinished reports as failed")
+
+    def _run(self, job_id):
+        try:
+            ReportJob.objects.filter(id=job_id).update(status='rendering')
+            stats = AdminSystemReportGenerator.generate_system_stats()
+            ReportJob.objects.filter(id=job_id).update(stats=stats, generated_at=stats['generated_at'])
+            html = AdminSystemReportGenerator.render_html(stats)
+
+            reports_dir = Path(settings.REPORTS_DIR)
+            reports_dir.mkdir(parents=True, exist_ok=True)
+            path = self._renderers.submit(render_pdf, html, str(reports_dir / f"{job_id}.pdf")).result()
+
+            ReportJob.objects.filter(id=job_id).update(
+                status='completed', file_path=path, finished_at=timezone.now()
+            )
+        except Exception as e:
+            logger.exception("Error generating report %s", job_id)
+            ReportJob.objects.filter(id=job_id).update(
+                status='failed', error=str(e), finished_at=timezone.now()
+            )
+        finally:
+            with self._lock:
+                self._futures.pop(job_id, None)
+            close_old_connections()
+
+report_runner = ReportJobRunner(
+    max_workers=getattr(settings, 'REPORT_WORKERS', 2),
+    render_timeout=getattr(settings, 'REPORT_RENDER_TIMEOUT', 300),
+)
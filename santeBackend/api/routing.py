@@ -1,5 +1,5 @@
 from django.urls import re_path
-from .consumers import ChatConsumer, NotificationConsumer
+from .consumers import ChatConsumer, MultiplexConsumer, NotificationConsumer
 
 websocket_urlpatterns = [
     # WebSocket for specific chat
@@ -7,4 +7,7 @@ websocket_urlpatterns = [
 
     # WebSocket for global notifications
     re_path(r"ws/notifications/$", NotificationConsumer.as_asgi()),
+
+    # Single WebSocket per client carrying all chats and notifications
+    re_path(r"ws/multiplex/$", MultiplexConsumer.as_asgi()),
 ]
@@ -0,0 +1,192 @@
+"""
+Full-text index for the patient search box.
+
+On SQLite the index is an FTS5 table with one row per patient user (the rowid
+is the user id) over their name, email, CPR number and medical record id. It
+is kept current by the signals in api/signals.py and can be rebuilt with the
+`rebuild_patient_search_index` management command. Other database backends
+have no index; `is_available()` is False there and search_patients falls back
+to filtering UserProfile directly.
+"""
+import re
+import unicodedata
+from django.db import connection
+from .models import Patient, UserProfile
+
+SEARCH_TABLE = 'api_patient_search'
+SEARCH_RESULT_LIMIT = 20
+MAX_SEARCH_RESULT_LIMIT = 100
+# Matches fetched per candidate query. Ranking every match of a short prefix
+# would cost time proportional to the table, so broad queries rank a bounded
+# set of candidates: rows whose names or ids contain the words exactly come
+# first, then the first prefix matches.
+RANK_CANDIDATES = 200
+
+# Columns where an exact word scores highest, searched before plain prefix matches
+EXACT_COLUMNS = ('first_name', 'last_name', 'cpr_number', 'medical_record_id')
+
+# Ranking weight of a query word matching each indexed column, in table order.
+# A word that is only a prefix of the column's word counts half.
+COLUMN_WEIGHTS = {
+    'first_name': 10.0,
+    'last_name': 10.0,
+    'email': 4.0,
+    'cpr_number': 8.0,
+    'medical_record_id': 8.0,
+}
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# UserProfile fields that decide whether and how a user is indexed
+INDEXED_USER_FIELDS = {'first_name', 'last_name', 'email', 'role'}
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def words(text):
+    """
+    Splits text into lowercase words without diacritics, like the index's tokenizer.
+    """
+    text = (text or '').lower()
+    if not text.isascii():
+        text = ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+    return WORD_PATTERN.findall(text)
+
+
+def candidate_expressions(query_words):
+    """
+    Returns the FTS5 queries that collect the candidates for the words typed in
+    the search box: every word exact in a name or id column, then every word but
+    the one still being typed exact, then every word as a prefix in any column,
+    e.g. ['ali', 'al'] -> '... : ("ali" "al")', '... : ("ali" "al"*)', '"ali"* "al"*'.
+    FTS5 returns matches in rowid order, so without the exact queries the best
+    match of a broad query could have too large an id to be a candidate.
+    """
+    columns = f"{{{' '.join(EXACT_COLUMNS)}}}"
+    exact = [f'"{word}"' for word in query_words]
+    expressions = [f"{columns} : ({' '.join(exact)})"]
+    if len(query_words) > 1:
+        expressions.append(f"{columns} : ({' '.join(exact[:-1])} \"{query_words[-1]}\"*)")
+    expressions.append(' '.join(f'"{word}"*' for word in query_words))
+    return expressions
+
+
+def score(query_words, values):
+    """
+    Scores an index row: each query word adds the weight of the column it
+    matches best.
+    """
+    columns = [(words(value), weight) for value, weight in zip(values, COLUMN_WEIGHTS.values())]
+    total = 0.0
+    for query_word in query_words:
+        best = 0.0
+        for column_words, weight in columns:
+            if query_word in column_words:
+                best = max(best, weight)
+            elif best < weight / 2 and any(word.startswith(query_word) for word in column_words):
+                best = weight / 2
+        total += best
+    return total
+
+
+def search(query, limit=SEARCH_RESULT_LIMIT):
+    """
+    Returns up to `limit` patients matching `query`, best match first, as
+    dicts with the fields of the search_patients response.
+    """
+    query_words = words(query)
+    if not query_words:
+        return []
+
+    candidates = {}
+    with connection.cursor() as cursor:
+        for expression in candidate_expressions(query_words):
+            cursor.execute(
+                f"SELECT rowid, {', '.join(COLUMN_WEIGHTS)} FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s LIMIT %s",
+                [expression, RANK_CANDIDATES]
+            )
+            for row in cursor.fetchall():
+                candidates.setdefault(row[0], row)
+
+    candidates = list(candidates.values())
+    candidates.sort(key=lambda row: (-score(query_words, row[1:]), row[2].lower(), row[1].lower()))
+    user_ids = [row[0] for row in candidates[:limit]]
+
+    # Results are read back from UserProfile, so a stale entry for a user
+    # that is gone or no longer a patient is never returned.
+    patients = {
+        patient['id']: patient
+        for patient in UserProfile.objects.filter(id__in=user_ids, role='patient').values(
+            'id', 'first_name', 'last_name', 'email', 'patient__CPR_number'
+        )
+    }
+    return [
+        {
+            'id': user_id,
+            'first_name': patients[user_id]['first_name'],
+            'last_name': patients[user_id]['last_name'],
+            'email': patients[user_id]['email'],
+            'CPR_number': patients[user_id]['patient__CPR_number'],
+        }
+        for user_id in user_ids if user_id in patients
+    ]
+
+
+def update_patient(user_id):
+    """
+    Re-indexes one user from the database, removing them from the index if
+    they are gone or are not a patient.
+    """
+    if not is_available():
+        return
+
+    row = (UserProfile.objects
+           .filter(id=user_id, role='patient')
+           .values_list('first_name', 'last_name', 'email', 'patient__CPR_number', 'patient__medical_record_id')
+           .first())
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [user_id])
+        if row is not None:
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(COLUMN_WEIGHTS)}) VALUES (%s, %s, %s, %s, %s, %s)",
+                [user_id, *(value or '' for value in row)]
+            )
+
+
+def remove_patient(user_id):
+    if not is_available():
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [user_id])
+
+
+def rebuild_index():
+    """
+    Re-creates every index row from UserProfile and Patient. Returns the
+    number of patients indexed.
+    """
+    user_table = UserProfile._meta.db_table
+    patient_table = Patient._meta.db_table
+    cpr_column = Patient._meta.get_field('CPR_number').column
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(
+            f'''
+            INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(COLUMN_WEIGHTS)})
+            SELECT u.id, COALESCE(u.first_name, ''), COALESCE(u.last_name, ''), COALESCE(u.email, ''),
+                   COALESCE(p."{cpr_column}", ''), COALESCE(p.medical_record_id, '')
+            FROM {user_table} u
+            LEFT JOIN {patient_table} p ON p.user_id = u.id
+            WHERE u.role = 'patient'
+            '''
+        )
+        count = cursor.rowcount
+        # Merge the index b-trees written by the bulk insert
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+
+    return count
@@ -0,0 +1,165 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .cache import dashboard_cache
+from . import search as patient_search
+from .models import Appointment, CarePlan, DailyAppointmentStats, Diagnosis, Employee, Patient, Prescription, UserProfile
+
+
+def _stats_key(appointment):
+    """
+    Returns the (date, doctor_id, status) rollup key for an appointment.
+    The date is normalised in case it was assigned as a string.
+    """
+    date_field = Appointment._meta.get_field('appointment_date')
+    return (
+        date_field.to_python(appointment.appointment_date),
+        appointment.doctor_id,
+        appointment.status,
+    )
+
+
+def adjust_daily_appointment_stats(key, delta):
+    """
+    Adds `delta` to the rollup row for `key`, creating the row if needed.
+    """
+    date, doctor_id, status = key
+    rows = DailyAppointmentStats.objects.filter(date=date, doctor_id=doctor_id, status=status)
+    if rows.update(count=F('count') + delta) or delta < 0:
+        return
+
+    try:
+        with transaction.atomic():
+            DailyAppointmentStats.objects.create(
+                date=date, doctor_id=doctor_id, status=status, count=delta
+            )
+    except IntegrityError:
+        # Another writer created the row first
+        rows.update(count=F('count') + delta)
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_previous_stats_key(sender, instance, **kwargs):
+    """
+    Stores the rollup key the appointment had before this save so status,
+    date or doctor changes can be moved to the right row.
+    """
+    instance._previous_stats_key = None
+    instance._previous_patient_id = None
+    if instance._state.adding:
+        return
+
+    previous = Appointment.objects.filter(pk=instance.pk).values_list(
+        'appointment_date', 'doctor_id', 'status', 'patient_id'
+    ).first()
+    if previous:
+        instance._previous_stats_key = previous[:3]
+        instance._previous_patient_id = previous[3]
+
+
+@receiver(post_save, sender=Appointment)
+def update_stats_on_save(sender, instance, created, **kwargs):
+    new_key = _stats_key(instance)
+    previous_key = getattr(instance, '_previous_stats_key', None)
+
+    if previous_key == new_key:
+        return
+    if previous_key:
+        adjust_daily_appointment_stats(previous_key, -1)
+    adjust_daily_appointment_stats(new_key, 1)
+
+
+@receiver(post_delete, sender=Appointment)
+def update_stats_on_delete(sender, instance, **kwargs):
+    adjust_daily_appointment_stats(_stats_key(instance), -1)
+
+
+def _appointment_dashboard_scopes(doctor_id, patient_id):
+    return ['admin', f"doctor:{doctor_id}", f"patient:{patient_id}"]
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_appointment_dashboards(sender, instance, **kwargs):
+    """
+    Appointments feed the admin dashboards and those of their doctor and patient,
+    including the previous doctor and patient if either was changed.
+    """
+    scopes = set(_appointment_dashboard_scopes(instance.doctor_id, instance.patient_id))
+    previous_key = getattr(instance, '_previous_stats_key', None)
+    if previous_key:
+        scopes.update(_appointment_dashboard_scopes(previous_key[1], instance._previous_patient_id))
+    dashboard_cache.invalidate_on_commit(*scopes)
+
+
+@receiver(post_save, sender=CarePlan)
+@receiver(post_delete, sender=CarePlan)
+@receiver(post_save, sender=Diagnosis)
+@receiver(post_delete, sender=Diagnosis)
+@receiver(post_save, sender=Prescription)
+@receiver(post_delete, sender=Prescription)
+def invalidate_patient_dashboard(sender, instance, **kwargs):
+    """
+    Care plans, diagnoses and prescriptions are only shown on the patient's dashboard.
+    """
+    patient_id = Appointment.objects.filter(pk=instance.appointment_id).values_list('patient_id', flat=True).first()
+    if patient_id is not None:
+        dashboard_cache.invalidate_on_commit(f"patient:{patient_id}")
+
+
+# User fields shown or filtered on by the dashboards
+DASHBOARD_USER_FIELDS = {'first_name', 'last_name', 'role'}
+
+
+def _user_dashboard_scopes(user_id):
+    """
+    Returns the admin scope, as the admin dashboards list every doctor and
+    search patients by name, and the scopes of the dashboards that show the
+    user: their appointment counterparts and the patients whose care plans
+    they completed.
+    """
+    scopes = {'admin'}
+    counterparts = Appointment.objects.filter(
+        Q(doctor_id=user_id) | Q(patient_id=user_id)
+    ).values_list('doctor_id', 'patient_id').distinct()
+    for doctor_id, patient_id in counterparts:
+        scopes.update(_appointment_dashboard_scopes(doctor_id, patient_id))
+
+    care_plan_patients = CarePlan.objects.filter(done_by_id=user_id).values_list(
+        'appointment__patient_id', flat=True
+    ).distinct()
+    scopes.update(f"patient:{patient_id}" for patient_id in care_plan_patients)
+    return scopes
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def invalidate_user_dashboards(sender, instance, update_fields=None, **kwargs):
+    """
+    Names, roles, specializations and office numbers of users are shown on
+    other users' dashboards.
+    """
+    if sender is UserProfile and update_fields is not None and not DASHBOARD_USER_FIELDS.intersection(update_fields):
+        return  # e.g. the last_login update on every login
+    dashboard_cache.invalidate_on_commit(*_user_dashboard_scopes(instance.pk))
+
+
+@receiver(post_save, sender=UserProfile)
+def update_patient_search_on_user_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not patient_search.INDEXED_USER_FIELDS.intersection(update_fields):
+        return  # e.g. the last_login update on every login
+    patient_search.update_patient(instance.pk)
+
+
+@receiver(post_delete, sender=UserProfile)
+def update_patient_search_on_user_delete(sender, instance, **kwargs):
+    patient_search.remove_patient(instance.pk)
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def update_patient_search_on_patient_change(sender, instance, **kwargs):
+    patient_search.update_patient(instance.user_id)
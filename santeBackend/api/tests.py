@@ -1,3 +1,1347 @@
-from django.test import TestCase
+import asyncio
+from datetime import date, time, timedelta
+import json
+import os
+from io import StringIO
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+from time import perf_counter, sleep
+from unittest import skipUnless
+from unittest.mock import patch
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.db import database_sync_to_async
+from channels.exceptions import ChannelFull
+from django.core.management import call_command
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+from django.db import IntegrityError, connection, transaction
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .models import Appointment, CarePlan, Chat, ChatMessage, DailyAppointmentStats, Employee, Log, Notification, NotificationCounter, Patient, ReportJob, UserProfile
+from .consumers import ChatConsumer, ChatMessageWriter, MultiplexConsumer, build_chat_message, mark_messages_read, save_chat_message
+from .cache import dashboard_cache
+from . import search
+from .layers import SQLiteChannelLayer
+from .middleware import SimpleJWTAuthMiddleware, token_cache
+from .reports import AdminSystemReportGenerator, ReportJobRunner
+from .utilities import BufferedLogWriter, get_new_and_returning_patients, log_to_db
 
-# Create your tests here.
+
+def create_user(email, role, **extra_fields):
+    return UserProfile.objects.create_user(
+        email=email,
+        first_name=email.split("@")[0],
+        last_name="Test",
+        role=role,
+        **extra_fields,
+    )
+
+
+def weasyprint_available():
+    """
+    WeasyPrint raises OSError on import when its native libraries, such as Pango, are missing.
+    """
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+def authenticate(client, user):
+    """
+    Sends a bearer token for the user.
+    """
+    token = AccessToken.for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+
+def create_patient(email):
+    return Patient.objects.create(user=create_user(email, "patient"))
+
+
+def create_doctor(email, specialization="General"):
+    return Employee.objects.create(
+        user=create_user(email, "doctor"),
+        specialization=specialization,
+        office_number="1",
+    )
+
+
+def create_appointment(patient, doctor, date, status="Scheduled"):
+    return Appointment.objects.create(
+        patient=patient,
+        doctor=doctor,
+        appointment_date=date,
+        appointment_time=time(9, 0),
+        status=status,
+    )
+
+
+class NewAndReturningPatientsTests(TestCase):
+    def setUp(self):
+        dashboard_cache.clear()
+        self.today = timezone.now().date()
+        self.doctor = create_doctor("doctor@test.com")
+        self.admin = create_user("admin@test.com", "admin")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def add_patients(self, count, returning=False):
+        for _ in range(count):
+            index = Patient.objects.count()
+            patient = create_patient(f"patient{index}@test.com")
+            if returning:
+                create_appointment(patient, self.doctor, self.today - timedelta(days=30))
+            create_appointment(patient, self.doctor, self.today)
+
+    def test_split_counts_new_and_returning(self):
+        self.add_patients(3)
+        self.add_patients(2, returning=True)
+
+        with self.assertNumQueries(1):
+            new_patients, returning_patients = get_new_and_returning_patients(
+                Appointment.objects.all(), self.today
+            )
+
+        self.assertEqual((new_patients, returning_patients), (3, 2))
+
+    def test_stats_query_count_is_constant(self):
+        self.add_patients(1)
+        self.add_patients(1, returning=True)
+        with self.assertNumQueries(4) as small:
+            response = self.client.get("/api/dashboard/admin/stats/")
+        self.assertEqual(response.data["new_patients"], 1)
+        self.assertEqual(response.data["returning_patients"], 1)
+
+        self.add_patients(20)
+        self.add_patients(20, returning=True)
+        with self.assertNumQueries(len(small.captured_queries)):
+            response = self.client.get("/api/dashboard/admin/stats/")
+        self.assertEqual(response.data["new_patients"], 21)
+        self.assertEqual(response.data["returning_patients"], 21)
+
+
+class DailyAppointmentStatsTests(TestCase):
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.doctor = create_doctor("doctor@test.com")
+        self.patient = create_patient("patient@test.com")
+
+    def stats(self):
+        return {
+            (row.date, row.doctor_id, row.status): row.count
+            for row in DailyAppointmentStats.objects.filter(count__gt=0)
+        }
+
+    def test_signals_track_create_update_and_delete(self):
+        first = create_appointment(self.patient, self.doctor, self.today)
+        create_appointment(self.patient, self.doctor, self.today)
+        self.assertEqual(self.stats(), {(self.today, self.doctor.pk, "Scheduled"): 2})
+
+        first.status = "Completed"
+        first.save()
+        self.assertEqual(self.stats(), {
+            (self.today, self.doctor.pk, "Scheduled"): 1,
+            (self.today, self.doctor.pk, "Completed"): 1,
+        })
+
+        first.delete()
+        self.assertEqual(self.stats(), {(self.today, self.doctor.pk, "Scheduled"): 1})
+
+    def test_rebuild_matches_incremental_rollup(self):
+        for days_ago, status in [(0, "Scheduled"), (1, "Completed"), (1, "Completed"), (3, "Cancelled")]:
+            create_appointment(self.patient, self.doctor, self.today - timedelta(days=days_ago), status)
+        incremental = self.stats()
+
+        DailyAppointmentStats.objects.all().delete()
+        call_command("rebuild_appointment_stats", stdout=StringIO())
+
+        self.assertEqual(self.stats(), incremental)
+
+
+class AdminDoctorPerformanceTests(TestCase):
+    def setUp(self):
+        dashboard_cache.clear()
+        self.today = timezone.now().date()
+        self.patient = create_patient("patient@test.com")
+        self.client = APIClient()
+        self.client.force_authenticate(user=create_user("admin@test.com", "admin"))
+
+    def test_single_query_for_all_doctors(self):
+        busy = create_doctor("busy@test.com", "Cardiology")
+        create_doctor("idle@test.com", "Dermatology")
+        create_appointment(self.patient, busy, self.today, "Completed")
+        create_appointment(self.patient, busy, self.today, "Completed")
+        create_appointment(self.patient, busy, self.today - timedelta(days=10), "Cancelled")
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/dashboard/admin/doctor-performance/")
+
+        performance = {row["doctor_name"]: row for row in response.data}
+        self.assertEqual(performance["busy Test"]["total_appointments"], 3)
+        self.assertCountEqual(performance["busy Test"]["chart_data"], [
+            {"browser": "Completed", "visitors": 2},
+            {"browser": "Cancelled", "visitors": 1},
+        ])
+        self.assertEqual(performance["idle Test"]["total_appointments"], 0)
+        self.assertEqual(performance["idle Test"]["chart_data"], [])
+
+    def test_date_and_specialization_filters(self):
+        busy = create_doctor("busy@test.com", "Cardiology")
+        create_doctor("idle@test.com", "Dermatology")
+        create_appointment(self.patient, busy, self.today, "Completed")
+        create_appointment(self.patient, busy, self.today - timedelta(days=10), "Cancelled")
+
+        response = self.client.get("/api/dashboard/admin/doctor-performance/", {
+            "specialization": "cardiology",
+            "date_from": (self.today - timedelta(days=1)).isoformat(),
+        })
+
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["chart_data"], [{"browser": "Completed", "visitors": 1}])
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        dashboard_cache.clear()
+        self.today = timezone.now().date()
+        self.doctor = create_doctor("doctor@test.com")
+        self.other_doctor = create_doctor("other@test.com")
+        self.patient = create_patient("patient@test.com")
+        self.client = APIClient()
+
+    def get_as(self, user, url):
+        self.client.force_authenticate(user=user)
+        return self.client.get(url)
+
+    def test_repeated_requests_are_served_from_cache(self):
+        create_appointment(self.patient, self.doctor, self.today)
+        self.get_as(self.doctor.user, "/api/doctor/dashboard/stats/")
+
+        with self.assertNumQueries(0):
+            response = self.get_as(self.doctor.user, "/api/doctor/dashboard/stats/")
+
+        self.assertEqual(response.data["todays_appointments"], 1)
+        self.assertEqual(dashboard_cache.stats()["DoctorDashboardStatsView"], {"hits": 1, "misses": 1})
+
+    def test_appointment_changes_only_invalidate_affected_scopes(self):
+        appointment = create_appointment(self.patient, self.doctor, self.today)
+        for user in (self.doctor.user, self.other_doctor.user):
+            self.get_as(user, "/api/doctor/dashboard/stats/")
+
+        appointment.status = "Completed"
+        appointment.save()
+
+        response = self.get_as(self.doctor.user, "/api/doctor/dashboard/stats/")
+        self.assertEqual(response.data["completed_today"], 1)
+        with self.assertNumQueries(0):
+            self.get_as(self.other_doctor.user, "/api/doctor/dashboard/stats/")
+
+    def test_care_plans_invalidate_the_patients_dashboard(self):
+        appointment = create_appointment(self.patient, self.doctor, self.today)
+        self.assertEqual(self.get_as(self.patient.user, "/api/patient/care-plans/").data, [])
+
+        CarePlan.objects.create(
+            appointment=appointment,
+            care_plan_title="Rest",
+            care_plan_type="Recovery",
+            done_by=self.doctor,
+        )
+
+        self.assertEqual(len(self.get_as(self.patient.user, "/api/patient/care-plans/").data), 1)
+
+    def test_doctor_changes_invalidate_the_dashboards_that_show_them(self):
+        create_appointment(self.patient, self.doctor, self.today)
+        admin = create_user("admin@test.com", "admin")
+        self.get_as(admin, "/api/dashboard/admin/doctor-performance/")
+        self.get_as(self.patient.user, "/api/patient/previous-doctors/")
+        self.get_as(self.other_doctor.user, "/api/doctor/dashboard/stats/")
+
+        self.doctor.user.last_name = "Renamed"
+        self.doctor.user.save()
+        self.doctor.specialization = "Cardiology"
+        self.doctor.save()
+
+        performance = self.get_as(admin, "/api/dashboard/admin/doctor-performance/").data
+        self.assertIn("doctor Renamed", [row["doctor_name"] for row in performance])
+        previous_doctor = self.get_as(self.patient.user, "/api/patient/previous-doctors/").data[0]
+        self.assertEqual((previous_doctor["last_name"], previous_doctor["specialization"]), ("Renamed", "Cardiology"))
+        with self.assertNumQueries(0):
+            self.get_as(self.other_doctor.user, "/api/doctor/dashboard/stats/")
+
+
+class ScheduleTests(TestCase):
+    def setUp(self):
+        self.monday = date(2025, 1, 6)
+        self.patient = create_patient("patient@test.com")
+        self.client = APIClient()
+        authenticate(self.client, create_user("reception@test.com", "receptionist"))
+
+    def create_scheduled_doctor(self, email, available_days):
+        doctor = create_doctor(email)
+        doctor.available_days = available_days
+        doctor.shift_start = time(8, 0)
+        doctor.shift_end = time(16, 0)
+        doctor.save()
+        return doctor
+
+    def test_query_count_does_not_grow_with_doctors(self):
+        for index in range(5):
+            doctor = self.create_scheduled_doctor(f"doctor{index}@test.com", ["monday"])
+            create_appointment(self.patient, doctor, self.monday)
+
+        # The user, the doctors and their appointments
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/schedule/", {"date": self.monday.isoformat()})
+
+        schedule = response.json()["schedule"]
+        self.assertEqual(len(schedule), 5)
+        self.assertTrue(all(len(entry["appointments"]) == 1 for entry in schedule))
+
+    def test_range_mode_returns_one_schedule_per_day(self):
+        doctor = self.create_scheduled_doctor("doctor@test.com", ["monday", "wednesday"])
+        create_appointment(self.patient, doctor, self.monday)
+        create_appointment(self.patient, doctor, self.monday + timedelta(days=2), "Cancelled")
+
+        response = self.client.get("/api/schedule/", {
+            "start": self.monday.isoformat(),
+            "end": (self.monday + timedelta(days=6)).isoformat(),
+        })
+
+        days = {day["date"]: day["schedule"] for day in response.json()["days"]}
+        self.assertEqual(len(days), 7)
+        self.assertEqual(len(days["2025-01-06"][0]["appointments"]), 1)
+        self.assertEqual(days["2025-01-08"][0]["appointments"], [])
+        self.assertEqual(days["2025-01-07"], [])
+
+
+class AdminUsersPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=create_user("admin@test.com", "admin"))
+        for index in range(15):
+            create_patient(f"patient{index}@test.com")
+        for index in range(10):
+            create_doctor(f"doctor{index}@test.com")
+
+    def test_page_is_loaded_with_constant_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/admin/users/")
+
+        self.assertEqual(response.data["count"], 26)
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertIn("CPR_number", response.data["results"][1])
+
+    def test_cursor_mode_walks_every_user_once(self):
+        seen = []
+        url, params = "/api/admin/users/", {"pagination": "cursor"}
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url, params)
+            seen.extend(user["id"] for user in response.data["results"])
+            url, params = response.data["next"], None
+
+        self.assertEqual(seen, sorted(UserProfile.objects.values_list("id", flat=True)))
+
+
+class AdminCursorPaginationTests(TestCase):
+    def setUp(self):
+        self.admin = create_user("admin@test.com", "admin")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def add_logs(self, count):
+        for index in range(count):
+            Log.objects.create(user=self.admin, action=f"ACTION {index}", ip_address="127.0.0.1")
+
+    def test_logs_cursor_is_stable_under_inserts(self):
+        self.add_logs(25)
+        expected = list(Log.objects.order_by("-timestamp", "-id").values_list("id", flat=True))
+
+        response = self.client.get("/api/logs/admin/", {"pagination": "cursor"})
+        seen = [log["id"] for log in response.data["results"]]
+        self.assertNotIn("count", response.data)
+
+        # Rows written while paging must not shift the following pages
+        self.add_logs(5)
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen.extend(log["id"] for log in response.data["results"])
+
+        self.assertEqual(seen, [str(log_id) for log_id in expected])
+
+    def test_appointment_cursor_is_stable_under_tied_inserts(self):
+        patient, doctor = create_patient("patient@test.com"), create_doctor("doctor@test.com")
+        day = date(2025, 1, 6)
+        originals = {str(create_appointment(patient, doctor, day).id) for _ in range(12)}
+        params = {"pagination": "cursor", "page_size": 5}
+
+        response = self.client.get("/api/appointments/", params)
+        first_page = [appointment["id"] for appointment in response.data["results"]]
+        seen = list(first_page)
+        second = self.client.get(response.data["next"])
+        previous = self.client.get(second.data["previous"])
+        self.assertEqual([appointment["id"] for appointment in previous.data["results"]], first_page)
+
+        # Rows with the same date and time as the cursor row land on both sides of it
+        for _ in range(6):
+            create_appointment(patient, doctor, day)
+        response = second
+        seen.extend(appointment["id"] for appointment in response.data["results"])
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen.extend(appointment["id"] for appointment in response.data["results"])
+
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertLessEqual(originals, set(seen))
+        ordered = Appointment.objects.filter(id__in=seen).order_by("appointment_date", "appointment_time", "id")
+        self.assertEqual(seen, [str(appointment.id) for appointment in ordered])
+
+    def test_page_number_mode_is_still_the_default(self):
+        self.add_logs(12)
+
+        response = self.client.get("/api/logs/admin/", {"page": 2})
+
+        self.assertEqual(response.data["count"], 12)
+        self.assertEqual(len(response.data["results"]), 2)
+
+
+class BufferedLogWriterTests(TransactionTestCase):
+    def setUp(self):
+        self.admin = create_user("admin@test.com", "admin")
+
+    def make_log(self, index):
+        return Log(user=self.admin, action=f"ACTION {index}", ip_address="127.0.0.1")
+
+    def test_background_thread_writes_full_batches(self):
+        writer = BufferedLogWriter(batch_size=5, flush_interval=0.05)
+        for index in range(5):
+            writer.enqueue(self.make_log(index))
+
+        for _ in range(100):
+            if Log.objects.count() == 5:
+                break
+            sleep(0.01)
+        writer.shutdown()
+
+        self.assertEqual(Log.objects.count(), 5)
+
+    def test_shutdown_flushes_pending_records(self):
+        writer = BufferedLogWriter(batch_size=100, flush_interval=60)
+        for index in range(3):
+            writer.enqueue(self.make_log(index))
+
+        writer.shutdown()
+
+        self.assertEqual(Log.objects.count(), 3)
+
+    def test_failed_batch_falls_back_to_single_rows(self):
+        existing = self.make_log("existing")
+        existing.save()
+        writer = BufferedLogWriter(batch_size=100, flush_interval=60)
+        for index in range(3):
+            writer.enqueue(self.make_log(index))
+        duplicate = self.make_log("duplicate")
+        duplicate.id = existing.id
+        writer.enqueue(duplicate)
+
+        with self.assertLogs("api.utilities", level="ERROR") as logs:
+            writer.shutdown()
+
+        self.assertEqual(Log.objects.count(), 4)
+        self.assertIn(str(existing.id), logs.output[0])
+
+    @override_settings(AUDIT_LOG_ASYNC=True)
+    def test_records_of_rolled_back_transactions_are_not_written(self):
+        request = RequestFactory().get("/")
+        request.user = self.admin
+        request.META["REMOTE_ADDR"] = "127.0.0.1"
+
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                log_to_db(request, "ROLLED BACK")
+                raise IntegrityError
+        log_to_db(request, "COMMITTED")
+
+        for _ in range(500):
+            if Log.objects.exists():
+                break
+            sleep(0.01)
+        self.assertEqual(list(Log.objects.values_list("action", flat=True)), ["COMMITTED"])
+
+
+
+class SystemStatsTests(TestCase):
+    def setUp(self):
+        self.admin = create_user("admin@test.com", "admin")
+        self.doctor = create_doctor("doctor@test.com")
+        Employee.objects.create(user=create_user("nurse@test.com", "nurse"), office_number="2")
+        self.patients = [create_patient(f"patient{index}@test.com") for index in range(3)]
+        self.patients[0].blood_type = "A+"
+        self.patients[0].save()
+
+        today = timezone.now().date()
+        create_appointment(self.patients[0], self.doctor, today)
+        create_appointment(self.patients[1], self.doctor, today - timedelta(days=10), status="Completed")
+        create_appointment(self.patients[2], self.doctor, today - timedelta(days=60), status="Completed")
+        Log.objects.create(user=self.admin, action="LOGIN", ip_address="127.0.0.1")
+
+    def test_stats_use_one_query_per_table(self):
+        with self.assertNumQueries(7):
+            stats = AdminSystemReportGenerator.generate_system_stats()
+
+        self.assertEqual(stats["user_stats"]["total_users"], 6)
+        self.assertEqual(stats["user_stats"]["users_by_role"], {"admin": 1, "doctor": 1, "nurse": 1, "patient": 3})
+        self.assertEqual(stats["patient_stats"]["total_patients"], 3)
+        self.assertEqual(stats["patient_stats"]["patients_by_blood_type"], {"A+": 1})
+        self.assertEqual(
+            (stats["employee_stats"]["total_employees"], stats["employee_stats"]["doctors"], stats["employee_stats"]["nurses"]),
+            (2, 1, 1),
+        )
+        self.assertEqual(stats["appointment_stats"]["total_appointments"], 3)
+        self.assertEqual(stats["appointment_stats"]["appointments_last_30_days"], 2)
+        self.assertEqual(stats["appointment_stats"]["appointments_by_status"], {"Scheduled": 1, "Completed": 2})
+        self.assertEqual(stats["system_activity"]["total_logs"], 1)
+        self.assertEqual(stats["system_activity"]["logs_last_30_days"], 1)
+
+    def test_stats_endpoint_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        response = client.get("/api/admin/system-stats/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["patient_stats"]["total_patients"], 3)
+
+        client.force_authenticate(user=self.doctor.user)
+        self.assertEqual(client.get("/api/admin/system-stats/").status_code, 403)
+
+class ReportJobTests(TransactionTestCase):
+    def setUp(self):
+        self.admin = create_user("admin@test.com", "admin")
+        self.reports_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.reports_dir.cleanup)
+
+    @skipUnless(weasyprint_available(), "WeasyPrint's native libraries are not installed")
+    def test_job_renders_report_in_worker_process(self):
+        runner = ReportJobRunner(max_workers=1)
+        self.addCleanup(runner.shutdown)
+
+        with override_settings(REPORTS_DIR=self.reports_dir.name):
+            job = runner.submit(self.admin)
+            runner.wait(job.id, timeout=120)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "completed", job.error)
+        self.assertEqual(job.file_path, os.path.join(self.reports_dir.name, f"{job.id}.pdf"))
+        self.assertTrue(os.path.exists(job.file_path))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(job.stats["user_stats"]["total_users"], 1)
+        self.assertIsNotNone(job.generated_at)
+
+    def test_status_and_download_endpoints(self):
+        path = os.path.join(self.reports_dir.name, "report.pdf")
+        with open(path, "wb") as report:
+            report.write(b"%PDF-1.7")
+        job = ReportJob.objects.create(requested_by=self.admin, status="completed", file_path=path)
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+
+        response = client.get(f"/api/admin/system-report/{job.id}/")
+        self.assertEqual(response.json()["download_url"], f"/api/admin/system-report/{job.id}/download/")
+
+        response = client.get(response.json()["download_url"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-1.7")
+
+        client.force_authenticate(user=create_user("patient@test.com", "patient"))
+        self.assertEqual(client.get(f"/api/admin/system-report/{job.id}/").status_code, 403)
+
+    def test_recent_snapshot_is_reused(self):
+        path = os.path.join(self.reports_dir.name, "report.pdf")
+        with open(path, "wb") as report:
+            report.write(b"%PDF-1.7")
+        old = ReportJob.objects.create(requested_by=self.admin, status="completed", file_path=path)
+        ReportJob.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(hours=2))
+        job = ReportJob.objects.create(
+            requested_by=self.admin, status="completed", file_path=path, stats={"user_stats": {"total_users": 1}}
+        )
+        ReportJob.objects.create(requested_by=self.admin, status="failed")
+        runner = ReportJobRunner(max_workers=1)
+
+        self.assertEqual(runner.latest(3600), job)
+        self.assertIsNone(runner.latest(0))
+
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        with override_settings(REPORT_MAX_AGE=3600):
+            response = client.post("/api/admin/system-report/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["job_id"], str(job.id))
+
+        response = client.get("/api/admin/system-report/")
+        self.assertEqual([report["job_id"] for report in response.json()["reports"]], [str(job.id), str(old.id)])
+        self.assertEqual(response.json()["reports"][0]["stats"], {"user_stats": {"total_users": 1}})
+
+        os.remove(path)
+        self.assertIsNone(runner.latest(3600))
+
+    def test_stale_jobs_are_failed_and_not_reused(self):
+        stale = ReportJob.objects.create(requested_by=self.admin, status="rendering")
+        ReportJob.objects.filter(id=stale.id).update(created_at=timezone.now() - timedelta(minutes=10))
+        runner = ReportJobRunner(max_workers=1, render_timeout=300)
+
+        self.assertIsNone(runner.latest(3600))
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, "failed")
+        self.assertEqual(stale.error, "Report timed out")
+
+        fresh = ReportJob.objects.create(requested_by=self.admin, status="queued")
+        self.assertEqual(runner.latest(3600), fresh)
+
+    def test_shutdown_fails_unfinished_jobs(self):
+        class BlockedRunner(ReportJobRunner):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.release = threading.Event()
+
+            def _run(self, job_id):
+                self.release.wait(5)
+
+        runner = BlockedRunner(max_workers=1)
+        running = runner.submit(self.admin)
+        queued = runner.submit(self.admin)
+        runner.shutdown()
+        runner.release.set()
+
+        for job in (running, queued):
+            job.refresh_from_db()
+            self.assertEqual(job.status, "failed")
+            self.assertEqual(job.error, "Server shut down before the report was finished")
+        self.assertIsNone(runner.latest(3600))
+
+
+class QueryPlanTests(TestCase):
+    """
+    Fails when a hot query stops using the index added for it, or needs a
+    temporary b-tree to sort any part of its results. Admin lists are checked
+    with the query their view runs for the second cursor page.
+    """
+
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.user = create_user("user@test.com", "patient")
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor != "sqlite":
+            self.skipTest("Query plan assertions are written for SQLite")
+        self.assertPlanUsesIndex(queryset.explain(), index_name)
+
+    def assertPlanUsesIndex(self, plan, index_name):
+        # A SEARCH reads a range of the index; a SCAN would read up to all of it
+        self.assertRegex(plan, rf"SEARCH \w+ USING (COVERING )?INDEX {index_name}\b", f"{index_name} not searched:\n{plan}")
+        # Also catches "USE TEMP B-TREE FOR RIGHT PART OF ORDER BY"
+        self.assertNotIn("USE TEMP B-TREE", plan)
+
+    def assertNextPageUsesIndex(self, url, table, index_name):
+        """
+        Follows the next link of an admin list's first cursor page and checks
+        the plan of the query the view ran on `table` for the second page.
+        """
+        if connection.vendor != "sqlite":
+            self.skipTest("Query plan assertions are written for SQLite")
+        client = APIClient()
+        client.force_authenticate(user=create_user("admin@test.com", "admin"))
+        response = client.get(url, {"pagination": "cursor", "page_size": 1})
+        with CaptureQueriesContext(connection) as queries:
+            client.get(response.data["next"])
+        sql = next(query["sql"] for query in queries.captured_queries if f'FROM "{table}"' in query["sql"])
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            plan = "\n".join(row[-1] for row in cursor.fetchall())
+        self.assertPlanUsesIndex(plan, index_name)
+
+    def test_appointment_queries_use_indexes(self):
+        self.assertUsesIndex(
+            Appointment.objects.filter(doctor_id=1, appointment_date=self.today), "appointment_doctor_date_idx"
+        )
+        self.assertUsesIndex(
+            Appointment.objects.filter(patient_id=1).order_by("appointment_date"), "appointment_patient_date_idx"
+        )
+        self.assertUsesIndex(
+            Appointment.objects.filter(appointment_date=self.today, status="Completed"), "appointment_date_status_idx"
+        )
+
+    def test_admin_appointment_cursor_page_uses_index(self):
+        patient, doctor = create_patient("patient@test.com"), create_doctor("doctor@test.com")
+        for _ in range(2):
+            create_appointment(patient, doctor, self.today)
+        self.assertNextPageUsesIndex("/api/appointments/", "api_appointment", "appointment_date_time_idx")
+
+    def test_chat_queries_use_indexes(self):
+        chat_id = "00000000-0000-0000-0000-000000000000"
+        self.assertUsesIndex(
+            ChatMessage.objects.filter(chat_id=chat_id).order_by("timestamp"), "chatmessage_chat_time_idx"
+        )
+        self.assertUsesIndex(
+            ChatMessage.objects.filter(chat_id=chat_id, is_read=False).exclude(sender=self.user),
+            "chatmessage_chat_unread_idx",
+        )
+        self.assertUsesIndex(
+            Notification.objects.filter(recipient=self.user, is_read=False), "notification_recipient_idx"
+        )
+
+    def test_admin_log_cursor_page_uses_index(self):
+        for index in range(2):
+            Log.objects.create(user=self.user, action=f"ACTION {index}", ip_address="127.0.0.1")
+        self.assertNextPageUsesIndex("/api/logs/admin/", "api_log", "log_timestamp_id_idx")
+
+
+class ChatHistoryTests(TestCase):
+    def setUp(self):
+        self.sender = create_user("sender@test.com", "doctor")
+        self.recipient = create_user("recipient@test.com", "patient")
+        self.chat = Chat.objects.create(user1=self.sender, user2=self.recipient)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.recipient)
+        self.url = f"/api/chats/{self.chat.id}/messages/"
+
+    def add_messages(self, count):
+        for index in range(count):
+            ChatMessage.objects.create(chat=self.chat, sender=self.sender, message_text=f"Message {index}")
+
+    def ordered_ids(self):
+        return [str(message_id) for message_id in
+                ChatMessage.objects.order_by("timestamp", "id").values_list("id", flat=True)]
+
+    def test_pages_walk_back_through_history(self):
+        self.add_messages(7)
+
+        seen = []
+        params = {"limit": 3}
+        while True:
+            with self.assertNumQueries(2):
+                response = self.client.get(self.url, params)
+            data = response.json()
+            seen = [message["id"] for message in data["messages"]] + seen
+            if not data["has_more"]:
+                break
+            params = {"limit": 3, "before": data["before"]}
+
+        self.assertEqual(seen, self.ordered_ids())
+        self.assertEqual(data["messages"][0]["sender_id"], self.sender.id)
+
+    def test_after_cursor_and_since_return_only_new_messages(self):
+        self.add_messages(2)
+        data = self.client.get(self.url).json()
+        last_seen = ChatMessage.objects.order_by("-timestamp").first().timestamp
+
+        self.add_messages(3)
+        after = self.client.get(self.url, {"after": data["after"]}).json()
+        since = self.client.get(self.url, {"since": last_seen.isoformat()}).json()
+
+        self.assertEqual([message["id"] for message in after["messages"]], self.ordered_ids()[2:])
+        self.assertEqual(since["messages"], after["messages"])
+        self.assertFalse(after["has_more"])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {"before": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_reading_history_does_not_mark_messages_read(self):
+        self.add_messages(2)
+
+        self.client.get(self.url)
+
+        self.assertEqual(ChatMessage.objects.filter(is_read=False).count(), 2)
+
+    def test_mark_read_up_to_message(self):
+        self.add_messages(4)
+        ids = self.ordered_ids()
+        url = f"/api/chats/{self.chat.id}/read/"
+
+        response = self.client.post(url, {"message_id": ids[1]}, format="json")
+        self.assertTrue(response.json()["updated"])
+        read = ChatMessage.objects.filter(is_read=True).values_list("id", flat=True)
+        self.assertCountEqual([str(message_id) for message_id in read], ids[:2])
+
+        # Repeating the receipt changes nothing
+        response = self.client.post(url, {"message_id": ids[1]}, format="json")
+        self.assertFalse(response.json()["updated"])
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.sender = create_user("sender@test.com", "doctor")
+        self.recipient = create_user("recipient@test.com", "patient")
+        self.chat = Chat.objects.create(user1=self.sender, user2=self.recipient)
+        self.client = APIClient()
+        authenticate(self.client, self.recipient)
+
+    def send_messages(self, count):
+        return [
+            async_to_sync(save_chat_message)(self.chat, self.sender, self.recipient, f"Message {index}")[0]
+            for index in range(count)
+        ]
+
+    def test_counters_follow_messages_and_read_receipts(self):
+        messages = self.send_messages(3)
+        self.chat.refresh_from_db()
+        self.assertEqual((self.chat.user1_unread_count, self.chat.user2_unread_count), (0, 3))
+        self.assertEqual(self.client.get("/api/notifications/summary/").json(), {"unread": 3})
+
+        mark_messages_read(self.chat.id, self.recipient.id, [messages[1].id])
+
+        self.chat.refresh_from_db()
+        self.assertEqual(self.chat.unread_count_for(self.recipient.id), 1)
+        self.assertEqual(self.client.get("/api/notifications/summary/").json(), {"unread": 1})
+        self.assertEqual(Notification.objects.filter(is_read=False).count(), 1)
+
+    def test_chat_list_reads_counters_without_extra_queries(self):
+        self.send_messages(2)
+
+        # The user and the chats with their counters
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/chats/")
+
+        self.assertEqual(response.json()["chats"][0]["unread_count"], 2)
+
+
+
+class PatientSearchTests(TestCase):
+    def setUp(self):
+        self.receptionist = create_user("desk@test.com", "receptionist")
+        self.ali = create_patient("ali.hassan@test.com")
+        self.ali.user.first_name, self.ali.user.last_name = "Ali", "Hassan"
+        self.ali.user.save()
+        self.ali.CPR_number = "850412345"
+        self.ali.medical_record_id = "MRN-0001"
+        self.ali.save()
+        self.alia = create_patient("alia@test.com")
+        self.alia.user.first_name, self.alia.user.last_name = "Alia", "Alfardan"
+        self.alia.user.save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.receptionist)
+
+    def search(self, query, **params):
+        response = self.client.get("/api/search/patients/", {"query": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [patient["id"] for patient in response.json()["patients"]]
+
+    def test_prefix_matches_are_ranked(self):
+        # "ali" is Ali's whole first name but only a prefix of Alia's
+        self.assertEqual(self.search("ali"), [self.ali.user_id, self.alia.user_id])
+        self.assertEqual(self.search("al alf"), [self.alia.user_id])
+        self.assertEqual(self.search("8504"), [self.ali.user_id])
+        self.assertEqual(self.search("mrn-0001"), [self.ali.user_id])
+        self.assertEqual(self.search("ali", limit=1), [self.ali.user_id])
+        self.assertEqual(self.search("zz"), [])
+
+    def test_exact_match_is_found_among_many_prefix_matches(self):
+        users = UserProfile.objects.bulk_create([
+            UserProfile(email=f"alina{index}@test.com", first_name="Alina", last_name="Test", role="patient")
+            for index in range(search.RANK_CANDIDATES + 10)
+        ])
+        Patient.objects.bulk_create([Patient(user=user, medical_record_id=f"MRN-{user.pk}") for user in users])
+        search.rebuild_index()
+        newest = create_patient("zayani@test.com")
+        newest.user.first_name, newest.user.last_name = "Ali", "Zayani"
+        newest.user.save()
+
+        self.assertEqual(self.search("ali", limit=2), [self.ali.user_id, newest.user_id])
+        self.assertEqual(self.search("ali zay", limit=1), [newest.user_id])
+        response = self.client.get("/api/search/patients/", {"query": "alina", "limit": 5})
+        self.assertEqual(response.json()["total_count"], 5)
+
+    def test_index_follows_changes(self):
+        self.alia.user.last_name = "Kanoo"
+        self.alia.user.save()
+        self.assertEqual(self.search("alfardan"), [])
+        self.assertEqual(self.search("kanoo"), [self.alia.user_id])
+
+        self.ali.CPR_number = "990000000"
+        self.ali.save()
+        self.assertEqual(self.search("850"), [])
+
+        self.ali.user.delete()
+        self.assertEqual(self.search("hassan"), [])
+        self.assertEqual(search.rebuild_index(), 1)
+        self.assertEqual(self.search("kanoo"), [self.alia.user_id])
+
+    def test_login_does_not_reindex(self):
+        self.ali.user.last_login = timezone.now()
+        with self.assertNumQueries(1):
+            self.ali.user.save(update_fields=["last_login"])
+
+class UserChatsTests(TestCase):
+    def setUp(self):
+        self.user = create_user("doctor@test.com", "doctor")
+        self.client = APIClient()
+        authenticate(self.client, self.user)
+        self.chats = []
+        for index in range(5):
+            partner = create_user(f"patient{index}@test.com", "patient")
+            chat = Chat.objects.create(user1=partner, user2=self.user)
+            async_to_sync(save_chat_message)(chat, partner, self.user, f"Hello from {index} " + "x" * 200)
+            self.chats.append(chat)
+
+    def test_chats_are_listed_most_recent_first_in_one_chat_query(self):
+        # The user and the chats
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/chats/")
+
+        chats = response.json()["chats"]
+        self.assertEqual([chat["id"] for chat in chats], [str(chat.id) for chat in reversed(self.chats)])
+        self.assertTrue(chats[0]["last_message"]["message_text"].startswith("Hello from 4"))
+        self.assertEqual(len(chats[0]["last_message"]["message_text"]), 100)
+        self.assertEqual(chats[0]["unread_count"], 1)
+
+    def test_pages_cover_every_chat_once(self):
+        seen = []
+        params = {"limit": 2}
+        while True:
+            # The user and the page of chats
+            with self.assertNumQueries(2):
+                data = self.client.get("/api/chats/", params).json()
+            seen.extend(chat["id"] for chat in data["chats"])
+            if not data["has_more"]:
+                break
+            params = {"limit": 2, "before": data["next"]}
+
+        self.assertEqual(seen, [str(chat.id) for chat in reversed(self.chats)])
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.doctor = create_doctor("doctor@test.com")
+        self.patient = create_patient("patient@test.com")
+        create_appointment(self.patient, self.doctor, self.today + timedelta(days=2))
+        create_appointment(self.patient, self.doctor, self.today + timedelta(days=1))
+        self.client = APIClient()
+
+    def test_next_appointment_views(self):
+        authenticate(self.client, self.patient.user)
+        # The user and the appointment
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/patient/next-appointment/")
+        self.assertEqual(response.json()["doctor_name"], "doctor Test")
+        self.assertEqual(response.json()["appointment_date"], (self.today + timedelta(days=1)).isoformat())
+
+        authenticate(self.client, self.doctor.user)
+        response = self.client.get("/api/doctor/appointments/next/")
+        self.assertEqual(response.json()["patient_name"], "patient Test")
+        self.assertEqual(self.client.get("/api/patient/next-appointment/").status_code, 401)
+
+    def test_user_info_get_is_async_and_put_is_still_served(self):
+        authenticate(self.client, self.patient.user)
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/user-info/")
+        self.assertEqual(response.json()["email"], "patient@test.com")
+
+        response = self.client.put("/api/user-info/", {"phone_number": "12345"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(UserProfile.objects.get(pk=self.patient.pk).phone_number, "12345")
+
+    def test_requests_without_a_valid_token_are_rejected(self):
+        self.assertEqual(self.client.get("/api/user-info/").status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer not-a-token")
+        self.assertEqual(self.client.get("/api/chats/").status_code, 401)
+
+    def test_changes_made_by_another_process_apply_at_once(self):
+        token = AccessToken.for_user(self.patient.user)
+        # A WebSocket handshake cached the validated token in this process
+        token_cache.set(str(token), token)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        # Another worker changes the role, which does not reach this process's cache
+        UserProfile.objects.filter(pk=self.patient.pk).update(role="doctor")
+        self.assertEqual(self.client.get("/api/patient/next-appointment/").status_code, 401)
+
+        UserProfile.objects.filter(pk=self.patient.pk).update(role="patient", is_active=False)
+        self.assertEqual(self.client.get("/api/user-info/").status_code, 401)
+
+
+class ChatConsumerTestMixin:
+    def setUp(self):
+        self.sender = create_user("sender@test.com", "doctor")
+        self.recipient = create_user("recipient@test.com", "patient")
+        self.chat = Chat.objects.create(user1=self.sender, user2=self.recipient)
+
+    async def connect(self, user, consumer=ChatConsumer):
+        if consumer is ChatConsumer:
+            path, kwargs = f"/ws/chat/{self.chat.id}/", {"chat_id": str(self.chat.id)}
+        else:
+            path, kwargs = "/ws/multiplex/", {}
+        communicator = ApplicationCommunicator(consumer.as_asgi(), {
+            "type": "websocket",
+            "path": path,
+            "headers": [],
+            "subprotocols": [],
+            "user": user,
+            "url_route": {"kwargs": kwargs},
+        })
+        await communicator.send_input({"type": "websocket.connect"})
+        response = await communicator.receive_output()
+        self.assertEqual(response["type"], "websocket.accept")
+        return communicator
+
+    async def send_json(self, communicator, data):
+        await communicator.send_input({"type": "websocket.receive", "text": json.dumps(data)})
+
+    async def receive_json(self, communicator):
+        response = await communicator.receive_output()
+        return json.loads(response["text"])
+
+    async def disconnect(self, communicator):
+        await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+        await communicator.wait()
+
+
+class ChatConsumerTests(ChatConsumerTestMixin, TransactionTestCase):
+    async def test_message_is_saved_with_notification(self):
+        previous_update = self.chat.last_updated_date
+        communicator = await self.connect(self.sender)
+
+        await self.send_json(communicator, {"message": "Hello"})
+        response = await self.receive_json(communicator)
+        await self.disconnect(communicator)
+
+        self.assertEqual(response["message_text"], "Hello")
+        message = await database_sync_to_async(ChatMessage.objects.get)(chat=self.chat)
+        self.assertEqual(message.message_text, "Hello")
+        self.assertEqual(response["id"], str(message.id))
+        self.assertEqual(response["timestamp"], message.timestamp.isoformat())
+        notification = await database_sync_to_async(Notification.objects.get)(message=message)
+        self.assertEqual(notification.recipient_id, self.recipient.id)
+        chat = await database_sync_to_async(Chat.objects.get)(id=self.chat.id)
+        self.assertGreater(chat.last_updated_date, previous_update)
+
+    @override_settings(CHAT_WRITE_BEHIND=True)
+    async def test_write_behind_broadcasts_before_saving(self):
+        communicator = await self.connect(self.sender)
+
+        await self.send_json(communicator, {"message": "Hello"})
+        response = await self.receive_json(communicator)
+        await self.disconnect(communicator)
+
+        message = await database_sync_to_async(ChatMessage.objects.get)(chat=self.chat)
+        self.assertEqual(str(message.id), response["id"])
+        self.assertTrue(await database_sync_to_async(
+            Notification.objects.filter(message=message, recipient=self.recipient).exists
+        )())
+        counter = await database_sync_to_async(NotificationCounter.objects.get)(user=self.recipient)
+        self.assertEqual(counter.unread, 1)
+        chat = await database_sync_to_async(Chat.objects.get)(id=self.chat.id)
+        self.assertEqual(chat.unread_count_for(self.recipient.id), 1)
+
+    async def test_write_behind_failed_batch_saves_the_rest_and_reports_the_failure(self):
+        communicator = await self.connect(self.sender)
+        stored, _ = await save_chat_message(self.chat, self.sender, self.recipient, "Stored")
+        first = build_chat_message(self.chat, self.sender, self.recipient, "First")
+        duplicate = build_chat_message(self.chat, self.sender, self.recipient, "Duplicate")
+        duplicate[0].id = stored.id
+        last = build_chat_message(self.chat, self.sender, self.recipient, "Last")
+
+        writer = ChatMessageWriter(batch_size=3, flush_interval=1)
+        with self.assertLogs(level="ERROR"):
+            for message, notification in (first, duplicate, last):
+                await writer.enqueue(message, notification)
+            await writer.flush()
+        failed = await self.receive_json(communicator)
+        await self.disconnect(communicator)
+
+        self.assertEqual(failed, {"type": "message_failed", "id": str(stored.id), "sender_id": self.sender.id})
+        texts = await database_sync_to_async(
+            lambda: set(ChatMessage.objects.values_list("message_text", flat=True))
+        )()
+        self.assertEqual(texts, {"Stored", "First", "Last"})
+        chat = await database_sync_to_async(Chat.objects.get)(id=self.chat.id)
+        self.assertEqual(chat.unread_count_for(self.recipient.id), 3)
+
+    @override_settings(TYPING_STATUS_DEBOUNCE=0.05, TYPING_STATUS_TIMEOUT=0.2)
+    async def test_typing_status_only_broadcasts_changes(self):
+        sender = await self.connect(self.sender)
+        recipient = await self.connect(self.recipient)
+
+        for _ in range(5):
+            await self.send_json(sender, {"type": "typing_status", "is_typing": True})
+        started = await self.receive_json(recipient)
+        self.assertTrue(started["is_typing"])
+
+        # A short pause followed by more typing is not broadcast
+        await self.send_json(sender, {"type": "typing_status", "is_typing": False})
+        await self.send_json(sender, {"type": "typing_status", "is_typing": True})
+        self.assertTrue(await recipient.receive_nothing(0.1))
+
+        # Typing that is never refreshed times out
+        stopped = await self.receive_json(recipient)
+        self.assertEqual(stopped["sender_id"], str(self.sender.id))
+        self.assertFalse(stopped["is_typing"])
+
+        # Disconnecting while idle sends nothing
+        await self.disconnect(sender)
+        self.assertTrue(await recipient.receive_nothing(0.1))
+        await self.disconnect(recipient)
+
+
+    @override_settings(READ_RECEIPT_WINDOW=0.05)
+    async def test_read_receipts_are_coalesced(self):
+        sender = await self.connect(self.sender)
+        recipient = await self.connect(self.recipient)
+        # The recipient marks messages read with the ids of the frames it received
+        message_ids = []
+        for index in range(3):
+            await self.send_json(sender, {"message": f"Message {index}"})
+            await self.receive_json(sender)
+            message_ids.append((await self.receive_json(recipient))["id"])
+
+        for message_id in message_ids:
+            await self.send_json(recipient, {"type": "mark_read", "message_id": message_id})
+        receipt = await self.receive_json(sender)
+
+        self.assertEqual(receipt, {"type": "read_receipt", "reader_id": str(self.recipient.id), "message_id": message_ids[-1]})
+        self.assertTrue(await sender.receive_nothing(0.1))
+        self.assertFalse(await database_sync_to_async(ChatMessage.objects.filter(is_read=False).exists)())
+        await self.disconnect(sender)
+        await self.disconnect(recipient)
+
+
+class MultiplexConsumerTests(ChatConsumerTestMixin, TransactionTestCase):
+    async def test_chats_and_notifications_share_one_socket(self):
+        other_chat = await database_sync_to_async(Chat.objects.create)(
+            user1=self.recipient, user2=self.sender
+        )
+        sender = await self.connect(self.sender, MultiplexConsumer)
+        recipient = await self.connect(self.recipient, MultiplexConsumer)
+
+        for communicator in (sender, recipient):
+            for chat in (self.chat, other_chat):
+                await self.send_json(communicator, {"action": "subscribe", "chat_id": str(chat.id)})
+                response = await self.receive_json(communicator)
+                self.assertEqual(response["action"], "subscribed")
+
+        await self.send_json(sender, {"action": "send_message", "chat_id": str(other_chat.id), "message": "Hi"})
+
+        events = [await self.receive_json(recipient) for _ in range(2)]
+        streams = {event["stream"]: event for event in events}
+        self.assertEqual(streams["chat"]["chat_id"], str(other_chat.id))
+        self.assertEqual(streams["chat"]["message_text"], "Hi")
+        self.assertEqual(streams["notifications"]["notification"]["chat_id"], str(other_chat.id))
+
+        await self.disconnect(sender)
+        await self.disconnect(recipient)
+
+    async def test_cannot_subscribe_to_other_users_chat(self):
+        outsider = await database_sync_to_async(create_user)("outsider@test.com", "patient")
+        communicator = await self.connect(outsider, MultiplexConsumer)
+
+        await self.send_json(communicator, {"action": "subscribe", "chat_id": str(self.chat.id)})
+        response = await self.receive_json(communicator)
+        await self.disconnect(communicator)
+
+        self.assertEqual(response["action"], "error")
+
+
+class SQLiteChannelLayerTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "channels.sqlite3")
+
+    async def test_group_send_reaches_channels_of_other_layers(self):
+        # Separate layer instances stand in for separate worker processes
+        sender = SQLiteChannelLayer(path=self.path)
+        receivers = [SQLiteChannelLayer(path=self.path) for _ in range(2)]
+        channels = [await layer.new_channel() for layer in receivers]
+        for layer, channel in zip(receivers, channels):
+            await layer.group_add("chat_test", channel)
+
+        await sender.group_send("chat_test", {"type": "chat.message", "text": "Hello"})
+
+        for layer, channel in zip(receivers, channels):
+            message = await asyncio.wait_for(layer.receive(channel), 1)
+            self.assertEqual(message["text"], "Hello")
+            await layer.close()
+
+    async def test_expired_messages_are_not_delivered(self):
+        layer = SQLiteChannelLayer(path=self.path, expiry=0)
+        channel = await layer.new_channel()
+        await layer.send(channel, {"type": "expired"})
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(layer.receive(channel), 0.1)
+        await layer.close()
+
+    async def test_waiting_for_the_write_lock_does_not_block_the_event_loop(self):
+        sender = SQLiteChannelLayer(path=self.path)
+        receiver = SQLiteChannelLayer(path=self.path)
+        channel = await receiver.new_channel()
+        await receiver.group_add("chat_test", channel)
+
+        # Another process holds the write lock for a while
+        loop = asyncio.get_running_loop()
+        blocker = sqlite3.connect(self.path, isolation_level=None)
+        blocker.execute("BEGIN IMMEDIATE")
+        loop.call_later(0.3, blocker.execute, "COMMIT")
+
+        gaps = []
+
+        async def tick():
+            while True:
+                started = loop.time()
+                await asyncio.sleep(0.01)
+                gaps.append(loop.time() - started)
+
+        ticker = asyncio.create_task(tick())
+        started = loop.time()
+        await sender.group_send("chat_test", {"type": "chat.message", "text": "Hello"})
+        waited = loop.time() - started
+        message = await asyncio.wait_for(receiver.receive(channel), 1)
+        ticker.cancel()
+        blocker.close()
+        await sender.close()
+        await receiver.close()
+
+        self.assertGreaterEqual(waited, 0.25)
+        self.assertEqual(message["text"], "Hello")
+        self.assertLess(max(gaps), 0.1)
+
+    async def test_messages_taken_after_a_receive_finished_are_kept(self):
+        # Polls only when woken, so the takes happen where the test expects them
+        layer = SQLiteChannelLayer(path=self.path, poll_interval=10, max_poll_interval=10)
+        channel = await layer.new_channel()
+        await layer.send(channel, {"type": "a"})
+        await layer.send(channel, {"type": "b"})
+        self.assertEqual((await asyncio.wait_for(layer.receive(channel), 1))["type"], "a")
+        await layer.send(channel, {"type": "c"})
+
+        # The poller starts taking "c" and waits for another process's write lock
+        blocker = sqlite3.connect(self.path, isolation_level=None)
+        blocker.execute("BEGIN IMMEDIATE")
+        await asyncio.sleep(0.05)
+        # Meanwhile "b" is received from the queue, which is then left empty
+        self.assertEqual((await asyncio.wait_for(layer.receive(channel), 1))["type"], "b")
+        blocker.execute("COMMIT")
+        blocker.close()
+        # The take of "c" completes before anything receives on the channel again
+        await asyncio.sleep(0.05)
+
+        self.assertEqual((await asyncio.wait_for(layer.receive(channel), 1))["type"], "c")
+        await layer.close()
+
+    async def test_send_respects_capacity(self):
+        layer = SQLiteChannelLayer(path=self.path, capacity=1)
+        channel = await layer.new_channel()
+        await layer.send(channel, {"type": "first"})
+
+        with self.assertRaises(ChannelFull):
+            await layer.send(channel, {"type": "second"})
+
+
+@skipUnless(os.getenv("RUN_LOAD_TESTS"), "Set RUN_LOAD_TESTS=1 to run load tests")
+class ChatLoadTests(ChatConsumerTestMixin, TransactionTestCase):
+    """
+    Measures chat messages per second through ChatConsumer, from the first send
+    until every message is stored.
+    """
+    message_count = 500
+    window = 50
+
+    async def measure(self):
+        communicator = await self.connect(self.sender)
+        started = perf_counter()
+        # Keep a window of messages in flight, below the in-memory channel capacity
+        for window_start in range(0, self.message_count, self.window):
+            for index in range(window_start, window_start + self.window):
+                await self.send_json(communicator, {"message": f"Message {index}"})
+            for _ in range(self.window):
+                await self.receive_json(communicator)
+        await self.disconnect(communicator)
+        elapsed = perf_counter() - started
+
+        stored = await database_sync_to_async(ChatMessage.objects.filter(chat=self.chat).count)()
+        self.assertEqual(stored, self.message_count)
+        return self.message_count / elapsed
+
+    async def test_message_throughput(self):
+        with override_settings(CHAT_WRITE_BEHIND=False):
+            inline_rate = await self.measure()
+        await database_sync_to_async(ChatMessage.objects.all().delete)()
+        with override_settings(CHAT_WRITE_BEHIND=True):
+            write_behind_rate = await self.measure()
+
+        print(f"\nChat messages/sec: inline {inline_rate:.0f}, write-behind {write_behind_rate:.0f}")
+
+
+class WebSocketAuthCacheTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = create_user("user@test.com", "doctor")
+        self.token = str(AccessToken.for_user(self.user))
+
+    def authenticate(self, token):
+        return async_to_sync(SimpleJWTAuthMiddleware.get_authenticated_user)(token)
+
+    def test_reconnect_skips_token_validation(self):
+        self.assertEqual(self.authenticate(self.token), self.user)
+
+        with patch.object(JWTAuthentication, "get_validated_token") as get_validated_token:
+            # Only the user is loaded
+            with self.assertNumQueries(1):
+                self.assertEqual(self.authenticate(self.token), self.user)
+        get_validated_token.assert_not_called()
+
+    def test_tampered_token_is_not_served_from_cache(self):
+        self.authenticate(self.token)
+
+        self.assertIsNone(self.authenticate(self.token[:-2] + "xx"))
+
+    def test_changes_made_by_another_process_apply_at_once(self):
+        self.authenticate(self.token)
+
+        # A queryset update sends no signals, like a change made in another worker
+        UserProfile.objects.filter(pk=self.user.pk).update(first_name="Renamed")
+        self.assertEqual(self.authenticate(self.token).first_name, "Renamed")
+
+        UserProfile.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(self.authenticate(self.token))
+
+
+class StartupImportTests(SimpleTestCase):
+    """
+    Guards the import cost of a server process: loading the ASGI application
+    and the URLconf must stay within budget and must not load WeasyPrint.
+    """
+    # Seconds, as reported by `python -X importtime`
+    IMPORT_BUDGET = 2.0
+
+    def test_asgi_startup_does_not_import_weasyprint(self):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c",
+             "import sys, santeBackend.asgi, santeBackend.urls; print('weasyprint' in sys.modules)"],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "santeBackend.settings"},
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        self.assertEqual(result.stdout.strip(), "False")
+
+        # Each line is "import time: self [us] | cumulative | module"
+        cumulative = {}
+        for line in result.stderr.splitlines():
+            fields = line.removeprefix("import time:").split("|")
+            if len(fields) == 3 and fields[1].strip().isdigit():
+                cumulative[fields[2].strip()] = int(fields[1]) / 1_000_000
+        startup = cumulative["santeBackend.asgi"] + cumulative["santeBackend.urls"]
+        self.assertLess(startup, self.IMPORT_BUDGET)
@@ -12,14 +12,17 @@ urlpatterns = [
     path('admin/users/', get_users_admin, name='get_users_admin'),
     path('admin/users/<int:user_id>/', update_user_admin, name='get_users_admin'),
     path('logs/admin/', get_logs_admin, name='get_logs_admin'),
+    path('admin/system-stats/', get_system_stats, name='admin-system-stats'),
     path('admin/system-report/', generate_admin_report, name='admin-system-report'),
+    path('admin/system-report/<uuid:job_id>/', report_job_status, name='admin-system-report-status'),
+    path('admin/system-report/<uuid:job_id>/download/', download_admin_report, name='admin-system-report-download'),
     
     # path('users/patients/', get_patients, name='get_patients'),
     path('available-doctors/', AvailableDoctorsView.as_view(), name='available-doctors'),
     path('appointments-by-date/', AppointmentsByDateView.as_view(), name='appointments-by-date'),
     
     # Schedule & Appointments
-    path('schedule/', get_schedule, name='get_schedule'),
+    path('schedule/', get_schedule_async, name='get_schedule'),
     path('user/schedule/', DoctorAppointmentsView.as_view(), name='get_schedule'),
     path('user/schedule/<int:user_id>/', DoctorAppointmentsView.as_view(), name='get_schedule'),
     
@@ -45,17 +48,19 @@ urlpatterns = [
     path('search/patients/', search_patients, name='search_patients'),
     
     #User info views
-    path('user-info/', UserInfoView.as_view(), name='user_info'), #to show current logged in user info
+    path('user-info/', user_info_async, name='user_info'), #to show current logged in user info
     path('user/<int:user_id>/', DetailedUserView.as_view(), name='user_info_specific'), #to show a users info
     path('users/<int:user_id>/basic', BasicUserInfo.as_view(), name='user_info_basic'), #to show a users basic info
     path('users/patients/', get_patients, name='get_patients'),
     path('users/doctors/', get_doctors, name='get_doctors'),
     
     # Chats
-    path('chats/', UserChatsView.as_view(), name='chats-view'),
+    path('chats/', user_chats_async, name='chats-view'),
     path('chats/users/', get_users_chat, name='get_users'),
     path('chats/<int:user_id>/', UserChatsView.as_view(), name='chats-view'),
     path('chats/<uuid:chat_id>/messages/', ChatMessagesView.as_view(), name='chat_messages'),
+    path('chats/<uuid:chat_id>/read/', ChatReadView.as_view(), name='chat_read'),
+    path('notifications/summary/', NotificationSummaryView.as_view(), name='notification_summary'),
     path('admin/chats/', get_chats_admin, name='chats-admin-view'),
     path('admin/chat/<uuid:chat_id>/messages/', get_chat_messages_admin, name='chat-messages-admin-view'),
 
@@ -68,17 +73,18 @@ urlpatterns = [
     path('dashboard/admin/doctor-performance/', AdminDoctorPerformanceView.as_view(), name='doctor-performance'),
     path('dashboard/admin/past-week-appointments/', AdminPastWeekAppointmentsView.as_view(), name='past-week-appointments'),
     path('dashboard/admin./appointments-pie-chart/', AdminAppointmentStatusPie.as_view(), name='appointments-pie-chart'),
+    path('dashboard/admin/cache-stats/', DashboardCacheStatsView.as_view(), name='dashboard-cache-stats'),
     
     # Doctor
     path('doctor/dashboard/stats/', DoctorDashboardStatsView.as_view(), name='doctor-dashboard-stats'),
-    path('doctor/appointments/next/', DoctorNextAppointmentsView.as_view(), name='doctor-next-appointments'),
+    path('doctor/appointments/next/', doctor_next_appointment_async, name='doctor-next-appointments'),
     path('doctor/appointments/chart/', DoctorAppointmentsChartView.as_view(), name='doctor-appointments-chart'),
     path('doctor/appointments/status-pie/', DoctorAppointmentStatusPieView.as_view(), name='doctor-appointment-status-pie'),
     path('doctor/appointments/past-week/', DoctorPastWeekAppointmentsView.as_view(), name='doctor-past-week-appointments'),
     
     # Patient
     path('patient/stats/', PatientStatsView.as_view(), name='patient-stats'),
-    path('patient/next-appointment/', PatientNextAppointmentView.as_view(), name='patient-next-appointment'),
+    path('patient/next-appointment/', patient_next_appointment_async, name='patient-next-appointment'),
     path('patient/previous-doctors/', PatientPreviousDoctorsView.as_view(), name='patient-previous-doctors'),
     path('patient/pie-chart/', PatientAppointmentsPieChartView.as_view(), name='patient-pie-chart'),
     path('patient/care-plans/', PatientCarePlansView.as_view(), name='patient-care-plans'),
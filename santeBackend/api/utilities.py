@@ -1,16 +1,154 @@
-from datetime import timedelta
-from django.utils import timezone
-from .models import Appointment, CarePlan, Employee, Log, Patient, Prescription, UserProfile
+import atexit
+from functools import partial
+import logging
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from .models import Log
 from channels.layers import get_channel_layer
-from django.template.loader import render_to_string
-from django.templatetags.static import static
-from django.db.models import Count
-from weasyprint import HTML, CSS
-import tempfile
+from django.db.models import Min
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # Wakes the log writer thread on shutdown
+
+class BufferedLogWriter:
+    """
+    Buffers Log records in memory and writes them with bulk_create from a
+    background thread once `batch_size` records are queued or `flush_interval`
+    seconds have passed. Anything still queued is written on interpreter exit.
+    If a batch fails, its records are saved one by one and retried, so one bad
+    record cannot take the rest of the batch with it.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=2.0, max_attempts=3):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def enqueue(self, log):
+        """
+        Queues an unsaved Log instance, starting the writer thread if needed.
+        """
+        self._queue.put(log)
+        if self._thread is None:
+            self._start()
+
+    def flush(self):
+        """
+        Synchronously writes every queued record from the calling thread.
+        """
+        batch = self._drain()
+        while batch:
+            self._write(batch)
+            batch = self._drain()
+
+    def shutdown(self):
+        """
+        Stops the writer thread and writes whatever is left in the queue.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _next_batch(self):
+        # Block for the first record, then collect until the batch is full or the interval ends
+        try:
+            log = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        if log is _STOP:
+            return []
+
+        batch = [log]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                log = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if log is _STOP:
+                break
+            batch.append(log)
+        return batch
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                log = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if log is not _STOP:
+                batch.append(log)
+        return batch
+
+    def _write(self, batch):
+        try:
+            Log.objects.bulk_create(batch, batch_size=self.batch_size)
+        except Exception as e:
+            logger.warning(f"Batch write of {len(batch)} audit log records failed, saving them one by one: {str(e)}")
+            for log in batch:
+                self._save(log)
+        finally:
+            close_old_connections()
+
+    def _save(self, log):
+        """
+        Saves one record after its batch failed. A record that still fails is
+        queued again up to `max_attempts` times and then logged in full, so it
+        can be recovered from the application log.
+        """
+        try:
+            log.save(force_insert=True)
+        except Exception as e:
+            attempts = getattr(log, '_write_attempts', 1) + 1
+            if attempts <= self.max_attempts:
+                log._write_attempts = attempts
+                self._queue.put(log)
+            else:
+                logger.error(
+                    f"Dropped audit log record after {self.max_attempts} attempts: {str(e)} "
+                    f"(id={log.id}, user={log.user_id}, action={log.action!r}, ip={log.ip_address}, "
+                    f"timestamp={log.timestamp.isoformat()}, description={log.description!r})"
+                )
+
+log_writer = BufferedLogWriter(
+    batch_size=getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 100),
+    flush_interval=getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 2.0),
+)
 
 def log_to_db(request, action, description=""):
     """
     Logs an activity for the current user.
+    The record is handed to the background log writer once the current
+    transaction commits, unless settings.AUDIT_LOG_ASYNC is False, in which
+    case it is saved immediately.
 
     Args:
         request (HttpRequest): The HTTP request object.
@@ -19,12 +157,17 @@ def log_to_db(request, action, description=""):
     """
     if request.user.is_authenticated:
         ip_address = get_client_ip(request)
-        Log.objects.create(
+        log = Log(
             user=request.user,
             action=action,
             ip_address=ip_address,
             description=description,
         )
+        if getattr(settings, 'AUDIT_LOG_ASYNC', True):
+            # Only records of committed work are written, as with log.save() in the transaction
+            transaction.on_commit(partial(log_writer.enqueue, log))
+        else:
+            log.save()
 
 def get_client_ip(request):
     """
@@ -43,6 +186,39 @@ def get_client_ip(request):
         ip = request.META.get("REMOTE_ADDR")
     return ip
 
+def get_new_and_returning_patients(appointments, date):
+    """
+    Splits the patients seen on a given date into new and returning patients
+    using a single grouped query.
+
+    Args:
+        appointments (QuerySet): The appointments defining the patient cohort
+            (e.g. all appointments, or a single doctor's appointments).
+        date (date): The day whose patients should be classified.
+
+    Returns:
+        tuple: (new_patients, returning_patients) counts. A patient is new when
+        their earliest appointment within ``appointments`` falls on ``date``.
+    """
+    patients_on_date = appointments.filter(appointment_date=date).values('patient')
+    first_visits = (
+        appointments.filter(patient__in=patients_on_date)
+        .order_by()
+        .values('patient')
+        .annotate(first_visit=Min('appointment_date'))
+        .values_list('first_visit', flat=True)
+    )
+
+    new_patients = 0
+    returning_patients = 0
+    for first_visit in first_visits:
+        if first_visit == date:
+            new_patients += 1
+        else:
+            returning_patients += 1
+
+    return new_patients, returning_patients
+
 def send_notification(user, message):
     """
     Sends a notification to a specific user via WebSockets.
@@ -57,123 +233,3 @@ def send_notification(user, message):
             'notification': message,  # The message to send
         }
     )
-    
-class AdminSystemReportGenerator:
-    @staticmethod
-    def generate_system_stats():
-        today = timezone.now()
-        thirty_days_ago = today - timedelta(days=30)
-        
-        # User Statistics
-        total_users = UserProfile.objects.count()
-        users_by_role = dict(UserProfile.objects.values_list('role').annotate(count=Count('id')))
-        
-        # Patient Statistics
-        patients = Patient.objects.all()
-        total_patients = patients.count()
-        patients_by_blood_type = dict(patients.exclude(blood_type__isnull=True)
-                                    .values_list('blood_type').annotate(count=Count('user_id')))
-        
-        # Employee Statistics
-        employees = Employee.objects.all()
-        total_employees = employees.count()
-        doctors = employees.filter(user__role='doctor').count()
-        nurses = employees.filter(user__role='nurse').count()
-        
-        # Appointment Statistics
-        appointments = Appointment.objects.all()
-        total_appointments = appointments.count()
-        appointments_last_30_days = appointments.filter(appointment_date__gte=thirty_days_ago).count()
-        appointments_by_status = dict(appointments.values_list('status').annotate(count=Count('id')))
-        
-        # Prescription Statistics
-        total_prescriptions = Prescription.objects.count()
-        prescriptions_last_30_days = Prescription.objects.filter(
-            appointment__appointment_date__gte=thirty_days_ago
-        ).count()
-        
-        # Care Plan Statistics
-        care_plans = CarePlan.objects.all()
-        total_care_plans = care_plans.count()
-        care_plans_by_type = dict(care_plans.values_list('care_plan_type').annotate(count=Count('id')))
-        
-        # System Activity
-        total_logs = Log.objects.count()
-        logs_last_30_days = Log.objects.filter(timestamp__gte=thirty_days_ago).count()
-        
-        return {
-            'generated_at': today,
-            'user_stats': {
-                'total_users': total_users,
-                'users_by_role': users_by_role,
-            },
-            'patient_stats': {
-                'total_patients': total_patients,
-                'patients_by_blood_type': patients_by_blood_type,
-            },
-            'employee_stats': {
-                'total_employees': total_employees,
-                'doctors': doctors,
-                'nurses': nurses,
-            },
-            'appointment_stats': {
-                'total_appointments': total_appointments,
-                'appointments_last_30_days': appointments_last_30_days,
-                'appointments_by_status': appointments_by_status,
-            },
-            'prescription_stats': {
-                'total_prescriptions': total_prescriptions,
-                'prescriptions_last_30_days': prescriptions_last_30_days,
-            },
-            'care_plan_stats': {
-                'total_care_plans': total_care_plans,
-                'care_plans_by_type': care_plans_by_type,
-            },
-            'system_activity': {
-                'total_logs': total_logs,
-                'logs_last_30_days': logs_last_30_days,
-            }
-        }
-
-    @staticmethod
-    def generate_pdf_report():
-        stats = AdminSystemReportGenerator.generate_system_stats()
-        banner_path = static('assets/banner.png')
-        html_string = render_to_string('admin_system_report.html', {'stats': stats, 'banner_path': f"http://sante.alialfardan.com/assets/banner.png"})
-        
-        html = HTML(string=html_string)
-        return html.write_pdf(stylesheets=[
-            CSS(string='''
-                @page { 
-                    size: letter; 
-                    margin: 2.5cm;
-                    @top-right {
-                        content: "Page " counter(page) " of " counter(pages);
-                    }
-                }
-                body { font-family: Arial, sans-serif; }
-                .header { text-align: center; margin-bottom: 30px; }
-                .section { margin-bottom: 25px; }
-                .stats-grid { 
-                    display: grid;
-                    grid-template-columns: 1fr 1fr;
-                    gap: 20px;
-                }
-                .stat-box {
-                    border: 1px solid #ddd;
-                    padding: 15px;
-                    border-radius: 5px;
-                }
-                .chart-container { margin: 20px 0; }
-                table { 
-                    width: 100%;
-                    border-collapse: collapse;
-                }
-                th, td {
-                    border: 1px solid #ddd;
-                    padding: 8px;
-                    text-align: left;
-                }
-                th { background-color: #f5f5f5; }
-            ''')
-        ])
\ No newline at end of file
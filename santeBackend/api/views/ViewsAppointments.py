@@ -1,8 +1,10 @@
+from collections import defaultdict
+import json
 from django.http import JsonResponse
 from datetime import datetime, time, timedelta
 from django.db.models import Q
 
-from .ViewsGeneral import AdminPagination
+from .ViewsGeneral import async_api_view, get_admin_paginator
 from ..models import Employee, Appointment, Patient, UserProfile
 from rest_framework.decorators import api_view, authentication_classes
 from rest_framework.response import Response
@@ -16,81 +18,172 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from ..serializers import AppointmentLimitedSerializer, AppointmentWriteSerializer, AppointmentSchedulerSerializer, AppointmentSerializer, AppointmentWithUserSerializer
-from rest_framework.pagination import PageNumberPagination
 
 logger = logging.getLogger(__name__)
 
-class AdminPagination(PageNumberPagination):
-    page_size = 10  # Number of appointments per page
-    page_size_query_param = "page_size"
+MAX_SCHEDULE_RANGE_DAYS = 31
+
+def _doctor_schedule_entry(doctor):
+    return {
+        'id': doctor.user.id,
+        'name': f"{doctor.user.first_name} {doctor.user.last_name}",
+        'specialization': doctor.specialization,
+        'office_number': doctor.office_number,
+        'available_days': doctor.available_days,
+        'shift_start': doctor.shift_start.strftime('%H:%M'),
+        'shift_end': doctor.shift_end.strftime('%H:%M'),
+    }
+
+def _appointment_schedule_entry(appointment):
+    return {
+        'date': appointment.appointment_date.strftime('%Y-%m-%d'),
+        'time': appointment.appointment_time.strftime('%H:%M'),
+        'id': appointment.id,
+        'patient_id': appointment.patient.user.id,
+        'patient_first_name': appointment.patient.user.first_name,
+        'patient_last_name': appointment.patient.user.last_name,
+        'patient_cpr': appointment.patient.CPR_number,
+        'patient_email': appointment.patient.user.email,
+        'status': appointment.status,
+    }
+
+def _schedule_days(start_date, end_date):
+    dates = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    return {date: date.strftime('%A').lower() for date in dates}
+
+def _schedule_doctors(day_names):
+    # Filter doctors based on available days
+    available_days_filter = Q()
+    for day_name in set(day_names.values()):
+        available_days_filter |= Q(available_days__icontains=day_name)
+    return Employee.objects.filter(
+        available_days_filter,
+        user__role='doctor'
+    ).select_related('user')
 
-@api_view(["GET"])
-def get_schedule(request):
+def _schedule_appointments(doctors, start_date, end_date):
+    # Get all appointments for these doctors in the range, excluding "No Show" and "Cancelled"
+    return Appointment.objects.filter(
+        doctor__in=doctors,
+        appointment_date__range=[start_date, end_date]
+    ).exclude(
+        status__in=["No Show", "Cancelled"]
+    ).select_related('patient__user').order_by('appointment_time')
+
+def _assemble_schedules(day_names, doctors, appointments):
+    appointments_by_doctor_and_date = defaultdict(list)
+    for appointment in appointments:
+        appointments_by_doctor_and_date[(appointment.doctor_id, appointment.appointment_date)].append(
+            _appointment_schedule_entry(appointment)
+        )
+
+    schedules = {}
+    for date, day_name in day_names.items():
+        # Include doctor in schedule regardless of appointments
+        schedules[date] = [
+            {
+                'doctor': _doctor_schedule_entry(doctor),
+                'appointments': appointments_by_doctor_and_date.get((doctor.pk, date), []),
+            }
+            for doctor in doctors
+            if day_name in json.dumps(doctor.available_days).lower()
+        ]
+    return schedules
+
+def _build_schedules(start_date, end_date):
     """
-    View to fetch doctors' schedules for a given day.
-    Shows all available doctors and their appointments if any.
-    Expects a 'date' parameter in the GET request (YYYY-MM-DD format).
+    Builds the per-day doctor schedules between start_date and end_date (inclusive)
+    using one query for the doctors and one for all of their appointments.
+    """
+    day_names = _schedule_days(start_date, end_date)
+    doctors = list(_schedule_doctors(day_names))
+    appointments = list(_schedule_appointments(doctors, start_date, end_date))
+    return _assemble_schedules(day_names, doctors, appointments)
+
+async def _abuild_schedules(start_date, end_date):
     """
-    date_str = request.GET.get('date')
+    Async version of _build_schedules using the async ORM.
+    """
+    day_names = _schedule_days(start_date, end_date)
+    doctors = [doctor async for doctor in _schedule_doctors(day_names)]
+    appointments = [appointment async for appointment in _schedule_appointments(doctors, start_date, end_date)]
+    return _assemble_schedules(day_names, doctors, appointments)
+
+def _parse_schedule_range(params):
+    """
+    Reads the requested dates from `date`, or `start` and `end`.
+    Returns (start_date, end_date, is_range, error_response).
+    """
+    start_str = params.get('start')
+    end_str = params.get('end')
+    if start_str or end_str:
+        try:
+            start_date = datetime.strptime(start_str or '', '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_str or '', '%Y-%m-%d').date()
+        except ValueError:
+            return None, None, True, JsonResponse({'success': False, 'message': 'Invalid date format. Use YYYY-MM-DD for start and end.'}, status=400)
+
+        if end_date < start_date:
+            return None, None, True, JsonResponse({'success': False, 'message': 'End date must not be before start date.'}, status=400)
+        if (end_date - start_date).days >= MAX_SCHEDULE_RANGE_DAYS:
+            return None, None, True, JsonResponse({'success': False, 'message': f'Date range cannot exceed {MAX_SCHEDULE_RANGE_DAYS} days.'}, status=400)
+        return start_date, end_date, True, None
+
+    date_str = params.get('date')
     if not date_str:
-        return JsonResponse({'success': False, 'message': 'Date parameter is required.'}, status=400)
+        return None, None, False, JsonResponse({'success': False, 'message': 'Date parameter is required.'}, status=400)
    
     try:
         selected_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        day_name = selected_date.strftime('%A').lower()
     except ValueError:
-        return JsonResponse({'success': False, 'message': 'Invalid date format. Use YYYY-MM-DD.'}, status=400)
-
-    # Filter doctors based on available days
-    doctors = Employee.objects.filter(
-        user__role='doctor',
-        available_days__icontains=day_name
-    ).select_related('user')
-
-    schedule = []
-    for doctor in doctors:
-        # Get appointments for the doctor on the selected date, excluding "No Show" and "Cancelled"
-        appointments = Appointment.objects.filter(
-            doctor=doctor,
-            appointment_date=selected_date
-        ).exclude(
-            status__in=["No Show", "Cancelled"]
-        ).select_related('patient', 'patient__user')
-
-        # Include doctor in schedule regardless of appointments
-        doctor_schedule = {
-            'doctor': {
-                'id': doctor.user.id,
-                'name': f"{doctor.user.first_name} {doctor.user.last_name}",
-                'specialization': doctor.specialization,
-                'office_number': doctor.office_number,
-                'available_days': doctor.available_days,
-                'shift_start': doctor.shift_start.strftime('%H:%M'),
-                'shift_end': doctor.shift_end.strftime('%H:%M'),
-            },
-            'appointments': [
-                {
-                    'date': appointment.appointment_date.strftime('%Y-%m-%d'),
-                    'time': appointment.appointment_time.strftime('%H:%M'),
-                    'id': appointment.id,
-                    'patient_id': appointment.patient.user.id,
-                    'patient_first_name': appointment.patient.user.first_name,
-                    'patient_last_name': appointment.patient.user.last_name,
-                    'patient_cpr': appointment.patient.CPR_number,
-                    'patient_email': appointment.patient.user.email,
-                    'status': appointment.status,
-                }
-                for appointment in appointments.order_by('appointment_time')
+        return None, None, False, JsonResponse({'success': False, 'message': 'Invalid date format. Use YYYY-MM-DD.'}, status=400)
+    return selected_date, selected_date, False, None
+
+def _schedule_response(params, schedules, is_range):
+    if is_range:
+        return JsonResponse({
+            'success': True,
+            'start': params.get('start'),
+            'end': params.get('end'),
+            'days': [
+                {'date': date.strftime('%Y-%m-%d'), 'schedule': schedule}
+                for date, schedule in schedules.items()
             ]
-        }
-        schedule.append(doctor_schedule)
+        })
 
     return JsonResponse({
         'success': True,
-        'date': date_str,
-        'schedule': schedule
+        'date': params.get('date'),
+        'schedule': next(iter(schedules.values()))
     })
 
+@api_view(["GET"])
+def get_schedule(request):
+    """
+    View to fetch doctors' schedules for a given day.
+    Shows all available doctors and their appointments if any.
+    Expects a 'date' parameter in the GET request (YYYY-MM-DD format),
+    or 'start' and 'end' parameters to fetch one schedule per day in that range.
+    """
+    start_date, end_date, is_range, error = _parse_schedule_range(request.GET)
+    if error:
+        return error
+
+    schedules = _build_schedules(start_date, end_date)
+    return _schedule_response(request.GET, schedules, is_range)
+
+@async_api_view()
+async def get_schedule_async(request):
+    """
+    Async version of get_schedule, served on the schedule/ URL.
+    """
+    start_date, end_date, is_range, error = _parse_schedule_range(request.GET)
+    if error:
+        return error
+
+    schedules = await _abuild_schedules(start_date, end_date)
+    return _schedule_response(request.GET, schedules, is_range)
+
 class AppointmentView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -120,7 +213,7 @@ class AppointmentView(APIView):
         search_query = request.query_params.get('search', '').strip()
         
         # Start with base queryset
-        appointments = Appointment.objects.select_related('patient', 'doctor').order_by('appointment_date', 'appointment_time').all()
+        appointments = Appointment.objects.select_related('patient', 'doctor').order_by('appointment_date', 'appointment_time', 'id')
 
         # Apply search if query exists
         if search_query:
@@ -130,7 +223,7 @@ class AppointmentView(APIView):
                 Q(status__icontains=search_query)
             )
         
-        paginator = AdminPagination()
+        paginator = get_admin_paginator(request, ordering=('appointment_date', 'appointment_time', 'id'))
         result_page = paginator.paginate_queryset(appointments, request)
         if request.user.role == "receptionist":
             serializer = AppointmentLimitedSerializer(result_page, many=True)
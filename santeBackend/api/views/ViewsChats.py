@@ -3,52 +3,132 @@ from django.http import Http404, HttpResponseForbidden, JsonResponse, HttpRespon
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
-from api.models import Chat, ChatMessage
+from api.models import Chat, ChatMessage, NotificationCounter
 from ..serializers import ChatMessageSerializer, ChatSerializer
-from .ViewsGeneral import AdminPagination
+from .ViewsGeneral import async_api_view, get_admin_paginator
 from ..utilities import log_to_db
+from ..consumers import chat_unread_count_update, mark_messages_read, send_read_receipt
+from django.db import transaction
+from asgiref.sync import async_to_sync
 from rest_framework import status
 from rest_framework.decorators import api_view, authentication_classes
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q
+from django.db.models import OuterRef, Q, Subquery
+from django.db.models.functions import Substr
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+import uuid
 
 User = get_user_model()
 
+CHAT_HISTORY_PAGE_SIZE = 50
+MAX_CHAT_HISTORY_PAGE_SIZE = 200
+CHAT_LIST_PAGE_SIZE = 50
+MAX_CHAT_LIST_PAGE_SIZE = 200
+CHAT_PREVIEW_LENGTH = 100
+
+def encode_cursor(timestamp, row_id):
+    """
+    Encodes a (timestamp, id) position in a chat list or history as an opaque cursor.
+    """
+    value = f"{timestamp.isoformat()}|{row_id}"
+    return urlsafe_b64encode(value.encode()).decode()
+
+def decode_cursor(cursor):
+    """
+    Returns the (timestamp, id) pair of a cursor. Raises ValueError if it is malformed.
+    """
+    timestamp, row_id = urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(timestamp), uuid.UUID(row_id)
+
+def _chat_participant(user):
+    return {
+        "id": user.id,
+        "email": user.email,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "profile_image": user.profile_image or None,
+        "role" : user.role,
+    }
+
+def _user_chats_query(user, params):
+    """
+    Builds the query for one page of a user's chats, most recently active first,
+    with both participants and a preview of the latest message.
+    Returns (queryset, limit, error_response); the queryset fetches one extra row.
+    """
+    try:
+        limit = min(int(params.get('limit', CHAT_LIST_PAGE_SIZE)), MAX_CHAT_LIST_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return None, None, HttpResponseBadRequest("Invalid limit")
+
+    latest_message = ChatMessage.objects.filter(chat=OuterRef('pk')).order_by('-timestamp', '-id')
+    chats = Chat.objects.filter(Q(user1=user) | Q(user2=user)).select_related('user1', 'user2').annotate(
+        last_message_text=Subquery(
+            latest_message.annotate(preview=Substr('message_text', 1, CHAT_PREVIEW_LENGTH)).values('preview')[:1]
+        ),
+        last_message_sender_id=Subquery(latest_message.values('sender_id')[:1]),
+        last_message_timestamp=Subquery(latest_message.values('timestamp')[:1]),
+    ).order_by('-last_updated_date', '-id')
+
+    before = params.get('before')
+    if before:
+        try:
+            last_updated_date, chat_id = decode_cursor(before)
+        except ValueError:
+            return None, None, HttpResponseBadRequest("Invalid cursor")
+        chats = chats.filter(
+            Q(last_updated_date__lt=last_updated_date) | Q(last_updated_date=last_updated_date, id__lt=chat_id)
+        )
+
+    # One extra row tells whether there is another page
+    return chats[:limit + 1], limit, None
+
+def _user_chats_response(user, chats, limit):
+    has_more = len(chats) > limit
+    chats = chats[:limit]
+
+    chat_data = [
+        {
+            "id": chat.id,
+            "user1": _chat_participant(chat.user1),
+            "user2": _chat_participant(chat.user2),
+            "created_date": chat.created_date,
+            "last_updated_date": chat.last_updated_date,
+            "unread_count": chat.unread_count_for(user.id),
+            "last_message": {
+                "sender_id": chat.last_message_sender_id,
+                "timestamp": chat.last_message_timestamp,
+                "message_text": chat.last_message_text,
+            } if chat.last_message_timestamp else None,
+        }
+        for chat in chats
+    ]
+    return JsonResponse({
+        "chats": chat_data,
+        "has_more": has_more,
+        "next": encode_cursor(chats[-1].last_updated_date, chats[-1].id) if has_more else None,
+    }, safe=False)
+
 class UserChatsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        user = request.user
-
-        chats = Chat.objects.filter(user1=user) | Chat.objects.filter(user2=user)
-        chat_data = [
-            {
-                "id": chat.id,
-                "user1": {
-                    "id": chat.user1.id,
-                    "email": chat.user1.email,
-                    "first_name": chat.user1.first_name,
-                    "last_name": chat.user1.last_name,
-                    "profile_image": chat.user1.profile_image.url if chat.user1.profile_image else None,
-                    "role" : chat.user1.role,
-                },
-                "user2": {
-                    "id": chat.user2.id,
-                    "email": chat.user2.email,
-                    "first_name": chat.user2.first_name,
-                    "last_name": chat.user2.last_name,
-                    "profile_image": chat.user2.profile_image.url if chat.user2.profile_image else None,
-                    "role" : chat.user2.role,
-                },
-                "created_date": chat.created_date,
-                "last_updated_date": chat.last_updated_date,
-            }
-            for chat in chats
-        ]
-        return JsonResponse({"chats": chat_data}, safe=False)
+        """
+        Returns the user's chats, most recently active first, with both participants,
+        a preview of the latest message and the user's unread count, in one query.
+        Pass the `next` cursor of a page as `before` to load the following page.
+        """
+        chats, limit, error = _user_chats_query(request.user, request.GET)
+        if error:
+            return error
+        return _user_chats_response(request.user, list(chats), limit)
 
-    
     def post(self, request):
         user1 = request.user
         if not user1.is_authenticated:
@@ -76,10 +156,28 @@ class UserChatsView(APIView):
             "last_updated_date": chat.last_updated_date,
         })
 
+@async_api_view(sync_view=UserChatsView.as_view())
+async def user_chats_async(request):
+    """
+    Async GET for UserChatsView, served on the chats/ URL; POST still goes to UserChatsView.
+    """
+    chats, limit, error = _user_chats_query(request.user, request.GET)
+    if error:
+        return error
+    return _user_chats_response(request.user, [chat async for chat in chats], limit)
+
 class ChatMessagesView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, chat_id):
+        """
+        Returns one page of a chat's history, oldest message first.
+
+        Reading history does not mark messages as read, see ChatReadView.
+        Without parameters the latest messages are returned. `before` and `after`
+        take the cursors of a previous page to load older or newer messages, and
+        `since` takes an ISO timestamp to fetch what arrived after it on reconnect.
+        """
         # Ensure the user is authenticated
         user = request.user
         if not user.is_authenticated:
@@ -89,27 +187,65 @@ class ChatMessagesView(APIView):
         chat = get_object_or_404(Chat, id=chat_id)
 
         # Check if the user is either user1, user2, or an admin
-        if chat.user1 != user and chat.user2 != user and user.role != "admin":
+        if chat.user1_id != user.id and chat.user2_id != user.id and user.role != "admin":
             return HttpResponseForbidden("You do not have permission to view these messages")
 
-        # Get all messages in the chat
-        messages = ChatMessage.objects.filter(chat=chat).order_by('timestamp')
-
-        # Mark all messages not from the current user as read
-        unread_messages = messages.exclude(sender=user).filter(is_read=False)
-        unread_messages.update(is_read=True)
-
-        message_data = [
-            {
-                "id": message.id,
-                "sender_id": message.sender.id,
-                "timestamp": message.timestamp,
-                "message_text": message.message_text,
-                "is_read": message.is_read,
-            }
-            for message in messages
-        ]
-        return JsonResponse({"messages": message_data}, safe=False)
+        try:
+            limit = min(int(request.GET.get('limit', CHAT_HISTORY_PAGE_SIZE)), MAX_CHAT_HISTORY_PAGE_SIZE)
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return HttpResponseBadRequest("Invalid limit")
+
+        messages = ChatMessage.objects.filter(chat=chat).values(
+            'id', 'sender_id', 'timestamp', 'message_text', 'is_read'
+        )
+
+        before, after, since = (request.GET.get(key) for key in ('before', 'after', 'since'))
+        try:
+            if before:
+                timestamp, message_id = decode_cursor(before)
+                messages = messages.filter(
+                    Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=message_id)
+                )
+                newest_first = True
+            elif after:
+                timestamp, message_id = decode_cursor(after)
+                messages = messages.filter(
+                    Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=message_id)
+                )
+                newest_first = False
+            elif since:
+                timestamp = parse_datetime(since)
+                if timestamp is None:
+                    raise ValueError
+                if timezone.is_naive(timestamp):
+                    timestamp = timezone.make_aware(timestamp)
+                messages = messages.filter(timestamp__gt=timestamp)
+                newest_first = False
+            else:
+                newest_first = True
+        except ValueError:
+            return HttpResponseBadRequest("Invalid cursor")
+
+        if newest_first:
+            messages = messages.order_by('-timestamp', '-id')
+        else:
+            messages = messages.order_by('timestamp', 'id')
+
+        # One extra row tells whether there is more history in this direction
+        message_data = list(messages[:limit + 1])
+        has_more = len(message_data) > limit
+        message_data = message_data[:limit]
+        if newest_first:
+            message_data.reverse()
+
+        return JsonResponse({
+            "messages": message_data,
+            "has_more": has_more,
+            "before": encode_cursor(message_data[0]['timestamp'], message_data[0]['id']) if message_data else before,
+            "after": encode_cursor(message_data[-1]['timestamp'], message_data[-1]['id']) if message_data else after,
+        }, safe=False)
 
     def post(self, request, chat_id):
         # Ensure the user is authenticated
@@ -126,12 +262,15 @@ class ChatMessagesView(APIView):
         if not message_text:
             return HttpResponseBadRequest("Missing message_text")
 
-        # Create a new chat message
-        message = ChatMessage.objects.create(
-            chat=chat,
-            sender=user,
-            message_text=message_text
-        )
+        # Create a new chat message and count it as unread for the other participant
+        recipient_id = chat.user2_id if chat.user1_id == user.id else chat.user1_id
+        with transaction.atomic():
+            message = ChatMessage.objects.create(
+                chat=chat,
+                sender=user,
+                message_text=message_text
+            )
+            Chat.objects.filter(id=chat.id).update(**chat_unread_count_update(recipient_id, 1))
 
         return JsonResponse({
             "id": message.id,
@@ -141,6 +280,41 @@ class ChatMessagesView(APIView):
             "is_read": message.is_read,
         })
 
+class ChatReadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, chat_id):
+        """
+        Marks the other participant's messages as read up to and including message_id,
+        and sends them a read receipt if anything changed.
+        """
+        user = request.user
+        chat = get_object_or_404(Chat, id=chat_id)
+        if chat.user1_id != user.id and chat.user2_id != user.id:
+            return HttpResponseForbidden("You do not have permission to read these messages")
+
+        message_id = request.data.get('message_id')
+        try:
+            uuid.UUID(str(message_id))
+        except ValueError:
+            return HttpResponseBadRequest("Invalid message_id")
+
+        last_read = mark_messages_read(chat.id, user.id, [message_id])
+        if last_read is not None:
+            async_to_sync(send_read_receipt)(chat.id, user.id, last_read)
+
+        return JsonResponse({"updated": last_read is not None})
+
+class NotificationSummaryView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Returns the user's unread notification count from its counter row.
+        """
+        unread = NotificationCounter.objects.filter(user=request.user).values_list('unread', flat=True).first()
+        return JsonResponse({"unread": unread or 0})
+
 @authentication_classes([IsAuthenticated])
 @api_view(["GET"])
 def get_chats_admin(request):
@@ -157,7 +331,7 @@ def get_chats_admin(request):
     search_query = request.query_params.get('search', '').strip()
     
     # Start with base queryset
-    chats = Chat.objects.select_related('user1', 'user2').order_by('-created_date')
+    chats = Chat.objects.select_related('user1', 'user2').order_by('-created_date', '-id')
     
     # Apply search if query exists
     if search_query:
@@ -167,7 +341,7 @@ def get_chats_admin(request):
         )
     
     # Paginate the filtered results
-    paginator = AdminPagination()
+    paginator = get_admin_paginator(request, ordering=('-created_date', '-id'))
     result_page = paginator.paginate_queryset(chats, request)
     
     # Serialize the data
@@ -192,7 +366,7 @@ def get_chat_messages_admin(request, chat_id):
     search_query = request.query_params.get('search', '').strip()
 
     # Retrieve all messages for the chat
-    messages = ChatMessage.objects.select_related('sender').filter(chat=chat).order_by('timestamp')
+    messages = ChatMessage.objects.select_related('sender').filter(chat=chat).order_by('timestamp', 'id')
 
     # Apply search if query exists
     if search_query:
@@ -201,7 +375,7 @@ def get_chat_messages_admin(request, chat_id):
             Q(message_text__icontains=search_query)
         )
 
-    paginator = AdminPagination()
+    paginator = get_admin_paginator(request, ordering=('timestamp', 'id'))
     result_page = paginator.paginate_queryset(messages, request)
     serialized_data = ChatMessageSerializer(result_page, many=True)
     return paginator.get_paginated_response(serialized_data.data)
\ No newline at end of file
@@ -2,17 +2,21 @@ import logging
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Count, Q, DateField
+from django.db.models import Count, Q, Sum
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models.functions import Cast
+from datetime import datetime, timedelta
 from ..serializers import AppointmentLimitedSerializer, AppointmentSerializer, PatientAppointmentSerializer
-from ..models import Appointment, CarePlan, Diagnosis, Employee, Prescription
+from ..models import Appointment, CarePlan, DailyAppointmentStats, Diagnosis, Employee, Prescription
+from ..utilities import get_new_and_returning_patients
+from .ViewsGeneral import async_api_view
+from ..cache import cache_dashboard, dashboard_cache
+from django.http import JsonResponse
 
 logger = logging.getLogger(__name__)
 
 
 class AdminDashboardStatsView(APIView):
+    @cache_dashboard
     def get(self, request):
 
         if request.user.role != 'admin':
@@ -34,23 +38,9 @@ class AdminDashboardStatsView(APIView):
         ).count()
 
         # Get new vs returning patients for today
-        todays_patients = Appointment.objects.filter(
-            appointment_date=today
-        ).values('patient').distinct()
-
-        # Count patients with their first appointment today
-        new_patients = 0
-        returning_patients = 0
-
-        for patient in todays_patients:
-            first_appointment = Appointment.objects.filter(
-                patient=patient['patient']
-            ).order_by('appointment_date').first()
-
-            if first_appointment and first_appointment.appointment_date == today:
-                new_patients += 1
-            else:
-                returning_patients += 1
+        new_patients, returning_patients = get_new_and_returning_patients(
+            Appointment.objects.all(), today
+        )
 
         # Calculate average daily appointments for the past week
         past_week_appointments = Appointment.objects.filter(
@@ -74,6 +64,7 @@ class AdminDashboardStatsView(APIView):
 
 
 class AdminAppointmentsChartView(APIView):
+    @cache_dashboard
     def get(self, request):
 
         if request.user.role != 'admin':
@@ -85,12 +76,12 @@ class AdminAppointmentsChartView(APIView):
         end_date = timezone.now().date()
         start_date = end_date - timedelta(days=180)
 
-        appointments = Appointment.objects.filter(
-            appointment_date__range=[start_date, end_date]
-        ).annotate(
-            date=Cast('appointment_date', DateField())
+        # Read from the daily rollup instead of aggregating the appointments
+        appointments = DailyAppointmentStats.objects.filter(
+            date__range=[start_date, end_date],
+            count__gt=0
         ).values('date').annotate(
-            count=Count('id')
+            count=Sum('count')
         ).order_by('date')
 
         # Format data for the chart
@@ -106,6 +97,7 @@ class AdminAppointmentsChartView(APIView):
 
 
 class AdminAppointmentStatusPie(APIView):
+    @cache_dashboard
     def get(self, request):
         if request.user.role != 'admin':
             return Response({
@@ -117,10 +109,11 @@ class AdminAppointmentStatusPie(APIView):
         start_date = end_date - timedelta(days=180)
 
         # Get appointments within date range and count by status
-        appointments = Appointment.objects.filter(
-            appointment_date__range=[start_date, end_date]
+        appointments = DailyAppointmentStats.objects.filter(
+            date__range=[start_date, end_date],
+            count__gt=0
         ).values('status').annotate(
-            count=Count('status')
+            count=Sum('count')
         )
 
         # Format data in the same structure as doctor performance
@@ -150,42 +143,73 @@ class AdminAppointmentStatusPie(APIView):
 
 
 class AdminDoctorPerformanceView(APIView):
+    @cache_dashboard
     def get(self, request):
         if request.user.role != 'admin':
             return Response({
                 'error': 'Unauthorized'
             }, status=status.HTTP_401_UNAUTHORIZED)
 
-        doctors = Employee.objects.filter(user__role='doctor')
-        performance_data = []
+        # Optional filters
+        specialization = request.query_params.get('specialization', '').strip()
+        try:
+            date_from = request.query_params.get('date_from')
+            date_to = request.query_params.get('date_to')
+            date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else None
+            date_to = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None
+        except ValueError:
+            return Response({
+                'error': 'Invalid date format. Use YYYY-MM-DD.'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        for doctor in doctors:
-            # Get appointment statistics for each doctor
-            appointments = Appointment.objects.filter(doctor=doctor)
-            status_counts = appointments.values('status').annotate(
-                count=Count('status')
-            )
+        appointment_filter = Q()
+        if date_from:
+            appointment_filter &= Q(doctor_appointments__appointment_date__gte=date_from)
+        if date_to:
+            appointment_filter &= Q(doctor_appointments__appointment_date__lte=date_to)
 
-            # Convert to the format needed for the pie chart
-            chart_data = []
-            for status in status_counts:
-                chart_data.append({
-                    'browser': status['status'],
-                    'visitors': status['count']
+        doctors = Employee.objects.filter(user__role='doctor')
+        if specialization:
+            doctors = doctors.filter(specialization__iexact=specialization)
+
+        # One grouped query: a row per (doctor, status), doctors without
+        # appointments come back once with a zero count
+        status_counts = doctors.values(
+            'user_id',
+            'user__first_name',
+            'user__last_name',
+            'specialization',
+            'office_number',
+            'doctor_appointments__status'
+        ).annotate(
+            count=Count('doctor_appointments', filter=appointment_filter)
+        ).order_by('user_id')
+
+        # Pivot the rows into the pie chart format in one pass
+        performance_data = {}
+        for row in status_counts:
+            doctor_data = performance_data.get(row['user_id'])
+            if doctor_data is None:
+                doctor_data = performance_data[row['user_id']] = {
+                    'doctor_name': f"{row['user__first_name']} {row['user__last_name']}",
+                    'specialization': row['specialization'],
+                    'office_number': row['office_number'],
+                    'total_appointments': 0,
+                    'chart_data': []
+                }
+
+            if row['count']:
+                doctor_data['total_appointments'] += row['count']
+                doctor_data['chart_data'].append({
+                    'browser': row['doctor_appointments__status'],
+                    'visitors': row['count']
                 })
 
-            performance_data.append({
-                'doctor_name': f"{doctor.user.first_name} {doctor.user.last_name}",
-                'specialization': doctor.specialization,
-                'office_number': doctor.office_number,
-                'total_appointments': appointments.count(),
-                'chart_data': chart_data
-            })
-
-        return Response(performance_data)
+        return Response(list(performance_data.values()))
 
 
 class AdminPastWeekAppointmentsView(APIView):
+    @cache_dashboard
     def get(self, request):
 
         if request.user.role != 'admin':
@@ -221,7 +245,21 @@ class AdminPastWeekAppointmentsView(APIView):
 # Doctor
 
 
+class DashboardCacheStatsView(APIView):
+    def get(self, request):
+        """
+        Returns the dashboard cache hits and misses per view for this worker process.
+        """
+        if request.user.role != 'admin':
+            return Response({
+                'error': 'Unauthorized'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+
+        return Response(dashboard_cache.stats())
+
+
 class DoctorDashboardStatsView(APIView):
+    @cache_dashboard
     def get(self, request):
         if request.user.role != 'doctor':
             return Response({
@@ -264,14 +302,49 @@ class DoctorDashboardStatsView(APIView):
         follow_up_rate = round(
             (follow_ups / total_recent * 100) if total_recent > 0 else 0, 1)
 
+        # Get new vs returning patients for today, relative to this doctor
+        new_patients, returning_patients = get_new_and_returning_patients(
+            Appointment.objects.filter(doctor_id=doctor_id), today
+        )
+
         return Response({
             'todays_appointments': todays_appointments,
             'completed_today': completed_appointments,
             'patients_this_week': patients_this_week,
-            'follow_up_rate': follow_up_rate
+            'follow_up_rate': follow_up_rate,
+            'new_patients': new_patients,
+            'returning_patients': returning_patients
         })
 
 
+def _upcoming_appointments(**filters):
+    """
+    Scheduled appointments from today on, soonest first.
+    """
+    return Appointment.objects.filter(
+        appointment_date__gte=timezone.now().date(),
+        status='Scheduled',
+        **filters
+    ).order_by('appointment_date', 'appointment_time')
+
+def _is_upcoming(appointment):
+    # If it's today, ensure the appointment is in the future
+    now = timezone.now()
+    return appointment is not None and not (
+        appointment.appointment_date == now.date() and appointment.appointment_time <= now.time()
+    )
+
+def _doctor_next_appointment_data(appointment):
+    return {
+        'appointment_id': appointment.id,
+        'patient_name': f"{appointment.patient.user.first_name} {appointment.patient.user.last_name}",
+        'patient_dob': appointment.patient.user.date_of_birth,
+        'patient_gender': appointment.patient.user.gender,
+        'patient_blood_type': appointment.patient.blood_type,
+        'appointment_date': appointment.appointment_date,
+        'appointment_time': appointment.appointment_time
+    }
+
 class DoctorNextAppointmentsView(APIView):
     def get(self, request):
         if request.user.role != 'doctor':
@@ -279,40 +352,33 @@ class DoctorNextAppointmentsView(APIView):
                 'error': 'Unauthorized'
             }, status=status.HTTP_401_UNAUTHORIZED)
 
-        doctor_id = request.user.id
-        today = timezone.now().date()
-        current_time = timezone.now().time()
-
         # Get the latest upcoming appointment
-        latest_appointment = Appointment.objects.filter(
-            doctor_id=doctor_id,
-            appointment_date__gte=today,
-            status='Scheduled'
-        ).select_related('patient__user').order_by('appointment_date', 'appointment_time').first()
-
-        # If it's today, ensure the appointment is in the future
-        if latest_appointment and latest_appointment.appointment_date == today and latest_appointment.appointment_time <= current_time:
-            latest_appointment = None
+        latest_appointment = _upcoming_appointments(doctor_id=request.user.id).select_related('patient__user').first()
 
         # Prepare response data
-        if latest_appointment:
-            appointment_data = {
-                'appointment_id': latest_appointment.id,
-                'patient_name': f"{latest_appointment.patient.user.first_name} {latest_appointment.patient.user.last_name}",
-                'patient_dob': latest_appointment.patient.user.date_of_birth,
-                'patient_gender': latest_appointment.patient.user.gender,
-                'patient_blood_type': latest_appointment.patient.blood_type,
-                'appointment_date': latest_appointment.appointment_date,
-                'appointment_time': latest_appointment.appointment_time
-            }
-            return Response(appointment_data)
+        if _is_upcoming(latest_appointment):
+            return Response(_doctor_next_appointment_data(latest_appointment))
         else:
             return Response({
                 'message': 'No upcoming appointments found'
             }, status=status.HTTP_204_NO_CONTENT)
 
+@async_api_view()
+async def doctor_next_appointment_async(request):
+    """
+    Async version of DoctorNextAppointmentsView, served on its URL.
+    """
+    if request.user.role != 'doctor':
+        return JsonResponse({'error': 'Unauthorized'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    latest_appointment = await _upcoming_appointments(doctor_id=request.user.id).select_related('patient__user').afirst()
+    if _is_upcoming(latest_appointment):
+        return JsonResponse(_doctor_next_appointment_data(latest_appointment))
+    return JsonResponse({'message': 'No upcoming appointments found'}, status=status.HTTP_204_NO_CONTENT)
+
 
 class DoctorAppointmentsChartView(APIView):
+    @cache_dashboard
     def get(self, request):
         if request.user.role != 'doctor':
             return Response({
@@ -325,13 +391,13 @@ class DoctorAppointmentsChartView(APIView):
         end_date = timezone.now().date()
         start_date = end_date - timedelta(days=180)
 
-        appointments = Appointment.objects.filter(
+        # Read from the daily rollup instead of aggregating the appointments
+        appointments = DailyAppointmentStats.objects.filter(
             doctor_id=doctor_id,
-            appointment_date__range=[start_date, end_date]
-        ).annotate(
-            date=Cast('appointment_date', DateField())
+            date__range=[start_date, end_date],
+            count__gt=0
         ).values('date').annotate(
-            count=Count('id')
+            count=Sum('count')
         ).order_by('date')
 
         # Format data for the chart
@@ -347,6 +413,7 @@ class DoctorAppointmentsChartView(APIView):
 
 
 class DoctorAppointmentStatusPieView(APIView):
+    @cache_dashboard
     def get(self, request):
         if request.user.role != 'doctor':
             return Response({
@@ -360,11 +427,12 @@ class DoctorAppointmentStatusPieView(APIView):
         start_date = end_date - timedelta(days=180)
 
         # Get appointments within date range and count by status
-        appointments = Appointment.objects.filter(
+        appointments = DailyAppointmentStats.objects.filter(
             doctor_id=doctor_id,
-            appointment_date__range=[start_date, end_date]
+            date__range=[start_date, end_date],
+            count__gt=0
         ).values('status').annotate(
-            count=Count('status')
+            count=Sum('count')
         )
 
         # Format data for the pie chart
@@ -392,6 +460,7 @@ class DoctorAppointmentStatusPieView(APIView):
 
 
 class DoctorPastWeekAppointmentsView(APIView):
+    @cache_dashboard
     def get(self, request):
         if request.user.role != 'doctor':
             return Response({
@@ -430,6 +499,7 @@ class DoctorPastWeekAppointmentsView(APIView):
 
 
 class PatientStatsView(APIView):
+    @cache_dashboard
     def get(self, request):
         if request.user.role != 'patient':
             return Response({
@@ -454,6 +524,16 @@ class PatientStatsView(APIView):
         return Response(stats, status=status.HTTP_200_OK)
 
 
+def _patient_next_appointment_data(appointment):
+    return {
+        'appointment_id': appointment.id,
+        'doctor_name': f"{appointment.doctor.user.first_name} {appointment.doctor.user.last_name}",
+        'appointment_date': appointment.appointment_date,
+        'appointment_time': appointment.appointment_time,
+        'office_number': appointment.doctor.office_number,
+        'specialization': appointment.doctor.specialization
+    }
+
 class PatientNextAppointmentView(APIView):
     def get(self, request):
         if request.user.role != 'patient':
@@ -461,34 +541,29 @@ class PatientNextAppointmentView(APIView):
                 'error': 'Unauthorized'
             }, status=status.HTTP_401_UNAUTHORIZED)
 
-        patient_id = request.user.id
-        today = timezone.now().date()
-        current_time = timezone.now().time()
-
-        next_appointment = Appointment.objects.filter(
-            patient_id=patient_id,
-            appointment_date__gte=today,
-            status='Scheduled'
-        ).order_by('appointment_date', 'appointment_time').first()
-
-        if next_appointment and next_appointment.appointment_date == today and next_appointment.appointment_time <= current_time:
-            next_appointment = None
-
-        if next_appointment:
-            appointment_data = {
-                'appointment_id': next_appointment.id,
-                'doctor_name': f"{next_appointment.doctor.user.first_name} {next_appointment.doctor.user.last_name}",
-                'appointment_date': next_appointment.appointment_date,
-                'appointment_time': next_appointment.appointment_time,
-                'office_number': next_appointment.doctor.office_number,
-                'specialization': next_appointment.doctor.specialization
-            }
-            return Response(appointment_data, status=status.HTTP_200_OK)
+        next_appointment = _upcoming_appointments(patient_id=request.user.id).select_related('doctor__user').first()
+
+        if _is_upcoming(next_appointment):
+            return Response(_patient_next_appointment_data(next_appointment), status=status.HTTP_200_OK)
         else:
             return Response({'message': 'No upcoming appointments found'}, status=status.HTTP_204_NO_CONTENT)
 
+@async_api_view()
+async def patient_next_appointment_async(request):
+    """
+    Async version of PatientNextAppointmentView, served on its URL.
+    """
+    if request.user.role != 'patient':
+        return JsonResponse({'error': 'Unauthorized'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    next_appointment = await _upcoming_appointments(patient_id=request.user.id).select_related('doctor__user').afirst()
+    if _is_upcoming(next_appointment):
+        return JsonResponse(_patient_next_appointment_data(next_appointment))
+    return JsonResponse({'message': 'No upcoming appointments found'}, status=status.HTTP_204_NO_CONTENT)
+
 
 class PatientPreviousDoctorsView(APIView):
+    @cache_dashboard
     def get(self, request):
         if request.user.role != 'patient':
             return Response({
@@ -518,6 +593,7 @@ class PatientPreviousDoctorsView(APIView):
 
 
 class PatientAppointmentsPieChartView(APIView):
+    @cache_dashboard
     def get(self, request):
         if request.user.role != 'patient':
             return Response({
@@ -545,6 +621,7 @@ class PatientAppointmentsPieChartView(APIView):
         return Response(reponse_data, status=status.HTTP_200_OK)
     
 class PatientCarePlansView(APIView):
+    @cache_dashboard
     def get(self, request):
         if request.user.role != 'patient':
             return Response({
@@ -577,6 +654,7 @@ class PatientCarePlansView(APIView):
         return Response(care_plan_list, status=status.HTTP_200_OK)
 
 class PatientDiagnosesView(APIView):
+    @cache_dashboard
     def get(self, request):
         if request.user.role != 'patient':
             return Response({
@@ -602,6 +680,7 @@ class PatientDiagnosesView(APIView):
         return Response(diagnosis_list, status=status.HTTP_200_OK)
 
 class PatientPrescriptionsView(APIView):
+    @cache_dashboard
     def get(self, request):
         if request.user.role != 'patient':
             return Response({
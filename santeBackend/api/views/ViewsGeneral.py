@@ -1,7 +1,9 @@
 from datetime import datetime
+import json
 import sys
 import os
 from sqlite3 import IntegrityError
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.http import FileResponse, HttpResponse
 from rest_framework import generics, status
@@ -10,16 +12,25 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.http import JsonResponse
-from ..models import UserProfile, Patient, Employee
+from ..models import UserProfile, Patient, Employee, ReportJob
 from django.db import transaction
 from ..serializers import *
 import logging
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
 from rest_framework.response import Response
 from django.db.models import Q
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
-from ..utilities import AdminSystemReportGenerator, get_client_ip, log_to_db
+from .. import search as patient_search
+from ..reports import AdminSystemReportGenerator, report_runner
+from ..utilities import get_client_ip, log_to_db
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +38,167 @@ logger = logging.getLogger(__name__)
 class AdminPagination(PageNumberPagination):
     page_size = 10  # Number of appointments per page WAS 28 
     page_size_query_param = "page_size"
+
+class AdminCursorPagination(CursorPagination):
+    """
+    Keyset pagination for deep paging through large admin lists.
+    Avoids the COUNT(*) and OFFSET scan of page number pagination.
+
+    DRF's CursorPagination only keys on the first ordering field and breaks
+    ties with an offset, which skips or repeats rows when tied rows are added
+    between pages. Here the cursor holds the values of every ordering field and
+    pages are selected with a composite keyset filter, (a, b, id) > (x, y, z),
+    so the ordering must end with a unique field.
+    """
+    page_size = 10
+    page_size_query_param = "page_size"
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor.reverse if self.cursor else False
+        current_position = self.cursor.position if self.cursor else None
+
+        if reverse:
+            queryset = queryset.order_by(*(order[1:] if order.startswith('-') else f'-{order}' for order in self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(self._after(current_position, reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = (
+            self._get_position_from_instance(results[-1], self.ordering)
+            if len(results) > len(self.page) else None
+        )
+        if reverse:
+            self.page.reverse()
+
+        # Both links are built from the rows on this page; an empty page keeps the cursor
+        first = self._get_position_from_instance(self.page[0], self.ordering) if self.page else current_position
+        last = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else current_position
+        if reverse:
+            self.has_next, self.has_previous = current_position is not None, following_position is not None
+        else:
+            self.has_next, self.has_previous = following_position is not None, current_position is not None
+        self.next_position, self.previous_position = last, first
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            value = instance[field_name] if isinstance(instance, dict) else getattr(instance, field_name)
+            values.append(None if value is None else str(value))
+        return json.dumps(values)
+
+    def _after(self, position, reverse):
+        """
+        Builds the keyset filter selecting the rows that come after `position`
+        in the (possibly reversed) ordering.
+        """
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        equal = Q()
+        for order, value in zip(self.ordering, values):
+            field_name = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+            condition |= equal & Q(**{f'{field_name}__{lookup}': value})
+            equal &= Q(**{field_name: value})
+
+        if len(self.ordering) > 1:
+            # A plain OR of the terms is planned as a scan of every remaining row and
+            # a sort; a range on the first field lets the ordering's index be walked
+            field_name = self.ordering[0].lstrip('-')
+            lookup = 'lte' if self.ordering[0].startswith('-') != reverse else 'gte'
+            condition = Q(**{f'{field_name}__{lookup}': values[0]}) & condition
+        return condition
+
+def get_admin_paginator(request, ordering):
+    """
+    Returns the paginator requested by the client: cursor pagination when
+    `?pagination=cursor` is passed, page number pagination otherwise.
+
+    Args:
+        request: The HTTP request object
+        ordering: The ordering used for cursor pagination; must be unique per row
+    """
+    if request.query_params.get('pagination') == 'cursor':
+        return AdminCursorPagination(ordering)
+    return AdminPagination()
+
+async def authenticate_request(request):
+    """
+    Returns the active user of the request's bearer token, or None.
+    Like JWTAuthentication the user is read from the database on every request,
+    so a deactivation or role change applies at once in every worker process.
+    """
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme not in jwt_settings.AUTH_HEADER_TYPES or not token:
+        return None
+
+    try:
+        validated_token = JWTAuthentication().get_validated_token(token)
+        user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+    except (InvalidToken, KeyError):
+        return None
+
+    user = await UserProfile.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+    if user is None or not user.is_active:
+        return None
+    return user
+
+def async_api_view(sync_view=None):
+    """
+    Makes an async function the GET handler of an authenticated endpoint, so under
+    ASGI it runs on the event loop with the async ORM instead of in the thread
+    pool used for sync views. Other methods are passed on to `sync_view`.
+
+    Args:
+        sync_view: Optional sync view (e.g. `SomeView.as_view()`) for the other methods
+    """
+    def decorator(get):
+        fallback = sync_to_async(sync_view) if sync_view else None
+
+        @csrf_exempt
+        @wraps(get)
+        async def view(request, *args, **kwargs):
+            if request.method != 'GET':
+                if fallback is None:
+                    return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+                return await fallback(request, *args, **kwargs)
+
+            user = await authenticate_request(request)
+            if user is None:
+                return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+            request.user = user
+            return await get(request, *args, **kwargs)
+
+        return view
+    return decorator
     
 # Create your views here.
 
@@ -46,7 +218,7 @@ def get_logs_admin(request):
     search_query = request.query_params.get('search', '').strip()
     
     # Start with base queryset
-    logs = Log.objects.select_related('user').order_by('-timestamp')
+    logs = Log.objects.select_related('user').order_by('-timestamp', '-id')
     
     # Apply search if query exists
     if search_query:
@@ -57,7 +229,7 @@ def get_logs_admin(request):
         )
     
     # Paginate the filtered results
-    paginator = AdminPagination()
+    paginator = get_admin_paginator(request, ordering=('-timestamp', '-id'))
     result_page = paginator.paginate_queryset(logs, request)
     
     # Serialize the data
@@ -150,15 +322,34 @@ class AvailableDoctorsView(APIView):
 @api_view(["GET"])
 def search_patients(request):
     """
-    Search for patients by first name, last name, email, and CPR number across UserProfile and Patient tables.
+    Search for patients by first name, last name, email, CPR number and medical record id.
+    Every word of the query is matched as a prefix against the patient search index
+    (see api/search.py) and results are ranked best match first.
     Query Parameters:
     - query: Search term (optional)
+    - limit: Maximum number of results (optional, default 20, at most 100)
     Returns:
-    - JSON response with patient search results
+    - JSON response with patient search results. `total_count` is the number of
+      patients returned, at most `limit`, not the number of patients that match;
+      counting every match of a short prefix would scan most of the index.
     """
     # Extract and sanitize search query
     query = request.GET.get('query', '').strip()
     try:
+        limit = min(max(int(request.GET.get('limit', patient_search.SEARCH_RESULT_LIMIT)), 1),
+                    patient_search.MAX_SEARCH_RESULT_LIMIT)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid limit.'}, status=400)
+
+    try:
+        if query and patient_search.is_available():
+            patients_list = patient_search.search(query, limit)
+            return JsonResponse({
+                'success': True,
+                'patients': patients_list,
+                'total_count': len(patients_list)
+            })
+
         # Start with a base queryset for patients only
         patients_qs = UserProfile.objects.filter(role='patient')
         
@@ -192,7 +383,7 @@ def search_patients(request):
             'last_name', 
             'email',
             'patient__CPR_number'
-        )
+        )[:limit]
         
         # Convert to list and format the results
         patients_list = [
@@ -219,21 +410,97 @@ def search_patients(request):
         }, status=500)
         
 @api_view(["GET"])
+def get_system_stats(request):
+    """
+    Live version of the statistics in the system report.
+    """
+    if request.user.role != "admin":
+        return Response(
+            {"error": "Forbidden: Only admins can access this resource."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    return Response(AdminSystemReportGenerator.generate_system_stats())
+
+
+REPORT_HISTORY_LIMIT = 20
+MAX_REPORT_HISTORY_LIMIT = 100
+
+
+def _report_job_data(job, include_stats=False):
+    data = {
+        'job_id': str(job.id),
+        'status': job.status,
+        'created_at': job.created_at,
+        'generated_at': job.generated_at,
+        'finished_at': job.finished_at,
+        'error': job.error or None,
+        'download_url': None,
+    }
+    if job.status == 'completed':
+        data['download_url'] = f"/api/admin/system-report/{job.id}/download/"
+    if include_stats:
+        data['stats'] = job.stats
+    return data
+
+
+@api_view(["GET", "POST"])
 def generate_admin_report(request):
-    # Check if user is admin
-    if not request.user.is_authenticated:
-        return HttpResponse(status=401)  # 401 Unauthorized
+    """
+    GET lists the stored report snapshots, newest first, with their statistics.
 
+    POST returns the newest snapshot if it is younger than REPORT_MAX_AGE, and
+    otherwise queues a new report; poll `report_job_status` until it has
+    completed. Pass `fresh=true` to always queue a new report.
+    """
     if request.user.role != 'admin':
         return HttpResponse(status=403)  # 403 Forbidden
-    
-    # Generate PDF
-    pdf_file = AdminSystemReportGenerator.generate_pdf_report()
-    
-    # Create response
-    response = HttpResponse(pdf_file, content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="system_report.pdf"'
-    
-    log_to_db(request, 'Generated system report', "Generated a system report")
-    
-    return response
\ No newline at end of file
+
+    if request.method == "GET":
+        try:
+            limit = min(int(request.query_params.get('limit', REPORT_HISTORY_LIMIT)), MAX_REPORT_HISTORY_LIMIT)
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+        jobs = ReportJob.objects.filter(status='completed').order_by('-created_at')[:max(limit, 1)]
+        return Response({'reports': [_report_job_data(job, include_stats=True) for job in jobs]})
+
+    fresh = str(request.data.get('fresh', request.query_params.get('fresh', ''))).lower() in ('1', 'true')
+    if not fresh:
+        job = report_runner.latest(settings.REPORT_MAX_AGE)
+        if job is not None:
+            return Response(_report_job_data(job))
+
+    job = report_runner.submit(request.user)
+
+    log_to_db(request, 'Generated system report', f"Requested system report {job.id}")
+
+    return Response(_report_job_data(job), status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(["GET"])
+def report_job_status(request, job_id):
+    if request.user.role != 'admin':
+        return HttpResponse(status=403)  # 403 Forbidden
+
+    # A job whose process died is reported as failed instead of rendering forever
+    report_runner.fail_stale_jobs()
+    job = get_object_or_404(ReportJob, id=job_id)
+    return Response(_report_job_data(job, include_stats=True))
+
+
+@api_view(["GET"])
+def download_admin_report(request, job_id):
+    if request.user.role != 'admin':
+        return HttpResponse(status=403)  # 403 Forbidden
+
+    job = get_object_or_404(ReportJob, id=job_id)
+    if job.status != 'completed' or not os.path.exists(job.file_path):
+        return Response({'error': 'Report is not available'}, status=status.HTTP_404_NOT_FOUND)
+
+    return FileResponse(
+        open(job.file_path, 'rb'),
+        as_attachment=True,
+        filename='system_report.pdf',
+        content_type='application/pdf'
+    )
@@ -7,7 +7,7 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.http import JsonResponse
-from ..views.ViewsGeneral import AdminPagination
+from ..views.ViewsGeneral import async_api_view, get_admin_paginator
 from ..utilities import log_to_db
 from ..models import UserProfile, Patient, Employee
 from django.db import transaction
@@ -240,8 +240,8 @@ def get_users_admin(request):
     # Get search query from request parameters
     search_query = request.query_params.get('search', '').strip()
     
-    # Start with base queryset
-    users = UserProfile.objects.all()
+    # Start with base queryset, role-specific data is joined in
+    users = UserProfile.objects.select_related('patient', 'employee').order_by('id')
 
     # Apply search if query exists
     if search_query:
@@ -252,9 +252,13 @@ def get_users_admin(request):
             Q(role__icontains=search_query)
         )
 
+    # Apply pagination in the database so only the page in view is loaded
+    paginator = get_admin_paginator(request, ordering=('id',))
+    result_page = paginator.paginate_queryset(users, request)
+
     # Prepare response data with additional data based on user role
     user_data = []
-    for user in users:
+    for user in result_page:
         user_info = {
             "id": user.id,
             "email": user.email,
@@ -271,7 +275,7 @@ def get_users_admin(request):
         # Add patient-specific data if the role is patient
         if user.role == "patient":
             try:
-                patient = Patient.objects.get(user=user)
+                patient = user.patient
                 user_info.update(
                     {
                         "medical_record_id": patient.medical_record_id,
@@ -293,7 +297,7 @@ def get_users_admin(request):
         # Add employee-specific data if the role is employee
         else:
             try:
-                employee = Employee.objects.get(user=user)
+                employee = user.employee
                 user_info.update(
                     {
                         "specialization": employee.specialization,
@@ -308,11 +312,7 @@ def get_users_admin(request):
 
         user_data.append(user_info)
 
-    # Apply pagination
-    paginator = AdminPagination()
-    result_page = paginator.paginate_queryset(user_data, request)
-
-    return paginator.get_paginated_response(result_page)
+    return paginator.get_paginated_response(user_data)
 
 @authentication_classes([IsAuthenticated])
 @api_view(["GET"])
@@ -354,7 +354,7 @@ def get_doctors(request):
     search_query = request.query_params.get('search', '').strip()
     
     # Start with base queryset
-    doctors = UserProfile.objects.filter(role="doctor")
+    doctors = UserProfile.objects.filter(role="doctor").order_by('id')
     
     # Apply search if query exists
     if search_query:
@@ -365,7 +365,7 @@ def get_doctors(request):
         )
     
     # Paginate the filtered results
-    paginator = AdminPagination()
+    paginator = get_admin_paginator(request, ordering=('id',))
     paginated_doctors = paginator.paginate_queryset(doctors, request)
     
     # Serialize the data
@@ -525,6 +525,13 @@ class UserInfoView(APIView):
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+@async_api_view(sync_view=UserInfoView.as_view())
+async def user_info_async(request):
+    """
+    Async GET for UserInfoView, served on the user-info/ URL; PUT still goes to UserInfoView.
+    """
+    return JsonResponse(UserSerializer(request.user).data)
+
 class PatientView(APIView):
     permission_classes = [IsAuthenticated]
 
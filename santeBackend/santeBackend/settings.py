@@ -153,12 +153,94 @@ AUTH_USER_MODEL = 'api.UserProfile'
 LOGIN_URL = '/login/'
 
 # Channel layers
-CHANNEL_LAYERS = {
+# "memory" only works with a single worker process. "sqlite" shares channels and
+# groups between all worker processes on this host through a local SQLite file.
+CHANNEL_LAYER_BACKEND = os.getenv('CHANNEL_LAYER_BACKEND', 'memory')
+
+if CHANNEL_LAYER_BACKEND == 'sqlite':
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "api.layers.SQLiteChannelLayer",
+            "CONFIG": {
+                "path": os.getenv('CHANNEL_LAYER_PATH', BASE_DIR / 'channels.sqlite3'),
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        },
+    }
+
+# Dashboard cache
+# "memory" keeps payloads in each worker process, so signal invalidations only
+# reach the process that saved the change; use "file" with several workers.
+DASHBOARD_CACHE_BACKEND = os.getenv('DASHBOARD_CACHE_BACKEND', 'memory')
+DASHBOARD_CACHE_TIMEOUT = 300
+
+if DASHBOARD_CACHE_BACKEND == 'file':
+    DASHBOARD_CACHE = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv('DASHBOARD_CACHE_PATH', BASE_DIR / 'dashboard_cache'),
+    }
+else:
+    DASHBOARD_CACHE = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "dashboard",
+    }
+
+CACHES = {
     "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     },
+    "dashboard": DASHBOARD_CACHE,
 }
 
+# Audit logging
+# log_to_db records are buffered and written in batches from a background thread.
+# Set AUDIT_LOG_ASYNC to false to save each record inside the request; the test
+# runner does so for test runs.
+AUDIT_LOG_ASYNC = os.getenv('AUDIT_LOG_ASYNC', 'true').lower() == 'true'
+AUDIT_LOG_BATCH_SIZE = 100
+AUDIT_LOG_FLUSH_INTERVAL = 2.0  # Seconds
+
+# Chat write-behind
+# When enabled, chat messages are broadcast before they are stored and written in
+# batches by a per-process writer task. Enqueueing blocks once MAX_PENDING messages
+# are waiting to be written.
+CHAT_WRITE_BEHIND = os.getenv('CHAT_WRITE_BEHIND', 'false').lower() == 'true'
+CHAT_WRITE_BEHIND_BATCH_SIZE = 100
+CHAT_WRITE_BEHIND_FLUSH_INTERVAL = 0.05  # Seconds
+CHAT_WRITE_BEHIND_MAX_PENDING = 1000
+
+# WebSocket authentication
+# Maximum number of validated access tokens cached by SimpleJWTAuthMiddleware
+WEBSOCKET_AUTH_CACHE_SIZE = 1024
+
+# Typing status
+# Seconds a "stopped typing" update is held back in case typing resumes, and
+# seconds without updates after which typing is stopped automatically
+TYPING_STATUS_DEBOUNCE = 1.0
+TYPING_STATUS_TIMEOUT = 5.0
+
+# Read receipts
+# Seconds over which a user's "read up to" updates for a chat are combined into one write
+READ_RECEIPT_WINDOW = 0.5
+
+# System reports
+# PDFs are rendered by REPORT_WORKERS background processes into REPORTS_DIR.
+# A report requested less than REPORT_MAX_AGE seconds after the previous one
+# is served from that snapshot unless a fresh one is asked for. A report still
+# queued or rendering after REPORT_RENDER_TIMEOUT seconds is marked failed.
+REPORTS_DIR = os.getenv('REPORTS_DIR', BASE_DIR / 'reports')
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', 2))
+REPORT_MAX_AGE = int(os.getenv('REPORT_MAX_AGE', 3600))
+REPORT_RENDER_TIMEOUT = int(os.getenv('REPORT_RENDER_TIMEOUT', 300))
+
 # ASGI application
 
 ASGI_APPLICATION = 'santeBackend.asgi.application'
+
+# Test runs save audit logs synchronously, see santeBackend/test_runner.py
+TEST_RUNNER = 'santeBackend.test_runner.TestRunner'
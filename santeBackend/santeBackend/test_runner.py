@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Saves audit log records inside the request during test runs, so no
+    background writer thread touches the test database while it is torn down.
+    Tests of the buffered writer turn AUDIT_LOG_ASYNC back on with override_settings.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._audit_log_async = settings.AUDIT_LOG_ASYNC
+        settings.AUDIT_LOG_ASYNC = False
+
+    def teardown_test_environment(self, **kwargs):
+        settings.AUDIT_LOG_ASYNC = self._audit_log_async
+        super().teardown_test_environment(**kwargs)